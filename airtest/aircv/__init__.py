@@ -1,4 +1,6 @@
 from .aircv import *
 from .error import *
-from .sift import find_sift
-from .template import find_template, find_all_template
\ No newline at end of file
+from .sift import find_sift, find_all_sift
+from .template import find_template, find_all_template
+from .keypoint import find_keypoint, find_all_keypoint, KEYPOINT_METHODS
+from .frame import LazyFrame
@@ -5,6 +5,7 @@
 
 
 import cv2
+import numpy as np
 from .utils import img_mat_rgb_2_gray
 
 
@@ -34,3 +35,27 @@ def cal_rgb_confidence(img_src_rgb, img_sch_rgb):
     weighted_confidence = bgr_confidence[0] * weight[0] + bgr_confidence[1] * weight[1] + bgr_confidence[2] * weight[2]
 
     return weighted_confidence
+
+
+def cal_rgb_confidence_batch(img_src_list, img_sch_rgb):
+    """同大小彩图批量计算相似度, 结果与逐个调用cal_rgb_confidence一致.
+
+    img_src_list: N张与img_sch_rgb同大小的彩图, 可以是shape为(N, h, w, 3)的数组.
+    """
+    # BGR三通道心理学权重:
+    weight = np.array([0.114, 0.587, 0.299])
+    src = np.asarray(img_src_list, dtype=np.float64)
+    sch = np.asarray(img_sch_rgb, dtype=np.float64)
+    # 按TM_CCOEFF_NORMED的定义, 各通道去均值后计算归一化相关系数:
+    src = src - src.mean(axis=(1, 2), keepdims=True)
+    sch = sch - sch.mean(axis=(0, 1), keepdims=True)
+    numerator = np.einsum("nhwc,hwc->nc", src, sch)
+    src_norm = np.sqrt((src ** 2).sum(axis=(1, 2)))
+    sch_norm = np.sqrt((sch ** 2).sum(axis=(0, 1)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bgr_confidence = numerator / (src_norm * sch_norm)
+    # 与cv2.matchTemplate保持一致: 模板为纯色时可信度为1, 截图为纯色时可信度为0
+    bgr_confidence = np.where(src_norm == 0, 0.0, bgr_confidence)
+    bgr_confidence = np.where(sch_norm == 0, 1.0, bgr_confidence)
+    # 加权可信度
+    return bgr_confidence.dot(weight)
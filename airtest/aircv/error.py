@@ -32,6 +32,11 @@ class NoSIFTModuleError(BaseError):
     pass
 
 
+class NoFeatureModuleError(BaseError):
+    """There is no such key point detector in OpenCV."""
+    pass
+
+
 class NoSiftMatchPointError(BaseError):
     """Exception raised for errors 0 sift points found in the input images."""
     pass
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""按需解码的截图帧.
+
+[description]
+    截图(jpg/png)只在需要时才解码, 并按需要解码为灰度图或缩小的图像(IMREAD_REDUCED_*),
+    只有需要rgb校验或保存截图时才解码为完整的彩图; 解码结果会被缓存.
+"""
+
+import struct
+import cv2
+import numpy as np
+
+from .aircv import rotate, imwrite
+
+# 支持缩小解码的倍数
+REDUCE_FLAGS = {
+    (False, 2): cv2.IMREAD_REDUCED_COLOR_2,
+    (False, 4): cv2.IMREAD_REDUCED_COLOR_4,
+    (False, 8): cv2.IMREAD_REDUCED_COLOR_8,
+    (True, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (True, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (True, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+# jpg中记录图像宽高的SOF段标记
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class LazyFrame(object):
+    """
+    Screenshot decoded on demand
+
+    Args:
+        data: encoded image (jpg/png), bytes or any buffer
+        image: decoded BGR image, for screenshots which are not encoded
+        rotation: counterclockwise rotation in degrees applied after decoding
+
+    """
+
+    def __init__(self, data=None, image=None, rotation=0):
+        if data is None and image is None:
+            raise ValueError("LazyFrame needs data or image")
+        self.data = data
+        self.rotation = int(rotation) % 360
+        self._images = {}
+        if image is not None:
+            self._images[(False, 1)] = rotate(image, self.rotation, clockwise=False)
+
+    @property
+    def resolution(self):
+        """(width, height) after rotation, read from the image header without decoding, None if invalid"""
+        for (gray, reduce), image in self._images.items():
+            if reduce == 1:
+                h, w = image.shape[:2]
+                return w, h
+        size = get_encoded_size(self.data)
+        if size is None:
+            # unknown format, decode to find out
+            image = self.color()
+            return None if image is None else (image.shape[1], image.shape[0])
+        w, h = size
+        return (h, w) if self.rotation in (90, 270) else (w, h)
+
+    def color(self, reduce=1):
+        """
+        Decode as BGR image
+
+        Args:
+            reduce: 1/2/4/8, decode at 1/reduce of the resolution
+
+        Returns:
+            image, None if the data can not be decoded
+
+        """
+        return self._decode(False, reduce)
+
+    def gray(self, reduce=1):
+        """
+        Decode as gray scale image, converted from the color image if it has been decoded already
+
+        Args:
+            reduce: 1/2/4/8, decode at 1/reduce of the resolution
+
+        Returns:
+            image, None if the data can not be decoded
+
+        """
+        return self._decode(True, reduce)
+
+    def thumbnail(self, min_width):
+        """
+        Decode as gray scale image at the smallest scale whose width is still no less than `min_width`
+
+        Args:
+            min_width: min width of the image
+
+        Returns:
+            image, None if the data can not be decoded
+
+        """
+        width = self.resolution[0]
+        reduce = max([1] + [r for r in (2, 4, 8) if width >= min_width * r])
+        return self.gray(reduce)
+
+    def jpeg(self):
+        """
+        Encoded jpg of the frame without encoding it again
+
+        Returns:
+            jpg bytes, None if the frame is not a jpg or it is rotated
+
+        """
+        # EXIF orientation is ignored by aircv.imread and most tools, so the rotated frame must be encoded again
+        if not self._is_jpeg() or self.rotation != 0:
+            return None
+        return bytes(self.data)
+
+    def save(self, filename):
+        """
+        Save the frame as jpg, the original jpg data is written as is when it is not rotated
+
+        Args:
+            filename: path of the file
+
+        Returns:
+            None
+
+        """
+        data = self.jpeg()
+        if data is None:
+            imwrite(filename, self.color())
+        else:
+            with open(filename, "wb") as f:
+                f.write(data)
+
+    def _is_jpeg(self):
+        return self.data is not None and bytes(self.data[:2]) == b"\xff\xd8"
+
+    def _decode(self, gray, reduce):
+        key = (gray, reduce)
+        if key in self._images:
+            return self._images[key]
+        color = self._images.get((False, reduce))
+        if gray and color is not None:
+            image = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
+        elif reduce != 1 and not self._is_jpeg():
+            # 只有jpg能真正缩小解码, 其他格式(如png)的缩小解码仍需完整解码, 因此由完整图像缩小得到
+            image = self._decode(gray, 1)
+            if image is None:
+                return None
+            h, w = image.shape[:2]
+            image = cv2.resize(image, ((w + reduce - 1) // reduce, (h + reduce - 1) // reduce),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            if reduce == 1:
+                flag = cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR
+            else:
+                flag = REDUCE_FLAGS[key]
+            image = cv2.imdecode(np.frombuffer(self.data, np.uint8), flag)
+            if image is None:
+                return None
+            image = rotate(image, self.rotation, clockwise=False)
+        self._images[key] = image
+        return image
+
+
+def get_encoded_size(data):
+    """从jpg/png的文件头中读取图像的宽高(width, height), 无法识别时返回None."""
+    if data is None or len(data) < 24:
+        return None
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+    idx = 2
+    while idx + 9 <= len(data):
+        prefix, marker = struct.unpack(">BB", data[idx:idx + 2])
+        if prefix != 0xFF:
+            return None
+        if marker == 0xFF:
+            # fill bytes
+            idx += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[idx + 5:idx + 9])
+            return width, height
+        segment_length, = struct.unpack(">H", data[idx + 2:idx + 4])
+        idx += 2 + segment_length
+    return None
+
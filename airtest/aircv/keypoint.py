@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""基于二进制特征描述(ORB/AKAZE/BRISK)的特征点匹配.
+
+[description]
+    使用汉明距离进行特征点匹配, 比sift快一个数量级, 鲁棒性稍差;
+    匹配点对的后处理与可信度计算和sift一致, 识别结果格式也一致.
+"""
+
+from .sift import _find_by_key_points, _find_all_by_key_points
+
+# 支持的二进制特征点算子, 可以直接写在ST.CVSTRATEGY中
+KEYPOINT_METHODS = ("orb", "akaze", "brisk")
+# 优秀特征点过滤比例值, 汉明距离下使用较宽松的比例
+FILTER_RATIO = 0.75
+
+
+def find_keypoint(im_source, im_search, threshold=0.8, rgb=True, good_ratio=FILTER_RATIO, method="orb"):
+    """基于二进制特征点进行图像识别，只筛选出最优区域."""
+    return _find_by_key_points(im_source, im_search, threshold, rgb, good_ratio, method)
+
+
+def find_all_keypoint(im_source, im_search, threshold=0.8, rgb=True, good_ratio=FILTER_RATIO, max_count=10, method="orb"):
+    """基于二进制特征点查找多个目标区域."""
+    return _find_all_by_key_points(im_source, im_search, threshold, rgb, good_ratio, max_count, method)
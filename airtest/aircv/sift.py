@@ -2,31 +2,61 @@
 # -*- coding: utf-8 -*-
 
 import cv2
+import hashlib
+import threading
 import numpy as np
 
+from airtest.utils.lru import LRUCache
 from .error import *  # noqa
 from .utils import generate_result, check_image_valid
 from .cal_confidence import cal_ccoeff_confidence, cal_rgb_confidence
 
 # SIFT识别特征点匹配，参数设置:
 FLANN_INDEX_KDTREE = 0
-FLANN = cv2.FlannBasedMatcher({'algorithm': FLANN_INDEX_KDTREE, 'trees': 5}, dict(checks=50))
+FLANN_INDEX_PARAMS = {'algorithm': FLANN_INDEX_KDTREE, 'trees': 5}
+FLANN_SEARCH_PARAMS = dict(checks=50)
+FLANN = cv2.FlannBasedMatcher(FLANN_INDEX_PARAMS, FLANN_SEARCH_PARAMS)
 # SIFT参数: FILTER_RATIO为SIFT优秀特征点过滤比例值(0-1范围，建议值0.4-0.6)
 FILTER_RATIO = 0.59
 # SIFT参数: SIFT识别时只找出一对相似特征点时的置信度(confidence)
 ONE_POINT_CONFI = 0.5
+# 多目标识别参数: 每个特征点取出的近邻个数(目标个数超过该值时比例筛选会失效)
+CLUSTER_KNN = 10
+# 多目标识别参数: 推算出的目标中心点聚类时的邻域半径(相对于目标宽高中的较小值)、核心点最少邻居数,
+# 以及识别区域交并比超过CLUSTER_OVERLAP_RATIO时视为同一目标
+CLUSTER_RADIUS = 0.25
+CLUSTER_MIN_SAMPLES = 3
+CLUSTER_OVERLAP_RATIO = 0.3
+# 缓存的模板图像特征点(keypoints, descriptors)个数, 以特征点算子和图像内容的hash值为key
+SEARCH_FEATURES_CACHE = LRUCache(100)
+# 缓存最近几帧源图像(截图)的特征点, 同一帧上的多次特征点查询共享特征点的计算结果
+FRAME_FEATURES_CACHE = LRUCache(4)
+# 保证同一帧只创建一个FrameFeatures
+_FRAME_FEATURES_LOCK = threading.Lock()
+# 特征点算子每个线程只初始化一次
+_LOCAL = threading.local()
 
 
 def find_sift(im_source, im_search, threshold=0.8, rgb=True, good_ratio=FILTER_RATIO):
     """基于sift进行图像识别，只筛选出最优区域."""
+    return _find_by_key_points(im_source, im_search, threshold, rgb, good_ratio, method="sift")
+
+
+def _find_by_key_points(im_source, im_search, threshold, rgb, good_ratio, method):
+    """基于特征点匹配进行图像识别，只筛选出最优区域. method为特征点算子: sift/orb/akaze/brisk."""
     # 第一步：检验图像是否正常：
     if not check_image_valid(im_source, im_search):
         return None
 
     # 第二步：获取特征点集并匹配出特征点对: 返回值 good, pypts, kp_sch, kp_src
-    kp_sch, kp_src, good = _get_key_points(im_source, im_search, good_ratio)
+    kp_sch, kp_src, good = _get_key_points(im_source, im_search, good_ratio, method)
+
+    # 第三步：根据匹配点对(good),提取出来识别区域, 并求出结果可信度:
+    return _get_result_from_good_points(im_source, im_search, kp_sch, kp_src, good, threshold, rgb, method)
 
-    # 第三步：根据匹配点对(good),提取出来识别区域:
+
+def _get_result_from_good_points(im_source, im_search, kp_sch, kp_src, good, threshold, rgb, method):
+    """根据匹配点对(good)提取出识别区域, 并求出结果可信度."""
     if len(good) == 0:
         # 匹配点对为0,无法提取识别区域：
         return None
@@ -51,35 +81,179 @@ def find_sift(im_source, im_search, threshold=0.8, rgb=True, good_ratio=FILTER_R
         # 匹配点对 >= 4个，使用单矩阵映射求出目标区域，据此算出可信度：
         middle_point, pypts, w_h_range = _many_good_pts(im_source, im_search, kp_sch, kp_src, good)
 
-    # 第四步：根据识别区域，求出结果可信度，并将结果进行返回:
+    # 根据识别区域，求出结果可信度，并将结果进行返回:
     # 对识别结果进行合理性校验: 小于5个像素的，或者缩放超过5倍的，一律视为不合法直接raise.
     _target_error_check(w_h_range)
-    # 将截图和识别结果缩放到大小一致,准备计算可信度
-    x_min, x_max, y_min, y_max, w, h = w_h_range
-    target_img = im_source[y_min:y_max, x_min:x_max]
-    resize_img = cv2.resize(target_img, (w, h))
-    confidence = _cal_sift_confidence(im_search, resize_img, rgb=rgb)
+    confidence = _cal_target_confidence(im_source, im_search, w_h_range, rgb)
 
     best_match = generate_result(middle_point, pypts, confidence)
-    print("[aircv][sift] threshold=%s, result=%s" % (threshold, best_match))
+    print("[aircv][%s] threshold=%s, result=%s" % (method, threshold, best_match))
     return best_match if confidence >= threshold else None
 
 
-def mask_sift(im_source, im_search, threshold=0.8, rgb=True, good_ratio=FILTER_RATIO):
+def mask_sift(im_source, im_search, threshold=0.8, rgb=True, good_ratio=FILTER_RATIO, max_count=10, method="sift"):
+    """基于sift查找多个目标区域的方法: 每识别出一个目标, 就屏蔽该区域内的源图像特征点, 再继续识别下一个目标."""
+    if not check_image_valid(im_source, im_search):
+        return None
+    # 特征点和近邻匹配只计算一次, 每一轮只在未被屏蔽的特征点中筛选匹配点对
+    kp_sch, kp_src, matches = _get_knn_matches(im_source, im_search, max(max_count, CLUSTER_KNN) + 1, method)
+    src_pts = np.float32([kp.pt for kp in kp_src])
+    masked = np.zeros(len(kp_src), dtype=bool)
+    result = []
+    while len(result) < max_count:
+        # 以最远的近邻为参照进行比例筛选, 各个目标的匹配点都会留下, 由单矩阵映射的RANSAC挑出其中一个目标
+        good = []
+        for knn in matches:
+            if len(knn) < 2:
+                continue
+            good.extend(m for m in knn[:-1] if not masked[m.trainIdx] and m.distance < good_ratio * knn[-1].distance)
+        good = _remove_duplicate_points(sorted(good, key=lambda m: m.distance), kp_src)
+        if not good:
+            break
+        try:
+            match = _get_result_from_good_points(im_source, im_search, kp_sch, kp_src, good, threshold, rgb, method)
+        except (HomographyError, SiftResultCheckError):
+            break
+        if not match:
+            break
+        result.append(match)
+        # 屏蔽识别区域内的特征点, 没有新的特征点被屏蔽时结束识别:
+        (x_min, y_min), (x_max, y_max) = np.min(match["rectangle"], axis=0), np.max(match["rectangle"], axis=0)
+        inside = (src_pts[:, 0] >= x_min) & (src_pts[:, 0] <= x_max) & (src_pts[:, 1] >= y_min) & (src_pts[:, 1] <= y_max)
+        if not (inside & ~masked).any():
+            break
+        masked |= inside
+    return result if result else None
+
+
+def find_all_sift(im_source, im_search, threshold=0.8, rgb=True, good_ratio=FILTER_RATIO, max_count=10):
     """基于sift查找多个目标区域的方法."""
-    # 求出特征点后，im_source中获得match的那些点进行聚类
-    raise NotImplementedError
+    return _find_all_by_key_points(im_source, im_search, threshold, rgb, good_ratio, max_count, method="sift")
 
 
-def find_all_sift(im_source, im_search, threshold=0.8, rgb=True, good_ratio=FILTER_RATIO):
-    """基于sift查找多个目标区域的方法."""
-    # 求出特征点后，im_source中获得match的那些点进行聚类
-    raise NotImplementedError
+def _find_all_by_key_points(im_source, im_search, threshold, rgb, good_ratio, max_count, method):
+    """
+    基于特征点匹配查找多个目标区域. method为特征点算子: sift/orb/akaze/brisk.
+
+    求出特征点后, 每对匹配点根据特征点的尺度和方向推算出目标中心在源图像中的位置,
+    对推算出的中心点进行密度聚类, 每一类匹配点单独求取单映射矩阵得到一个目标区域.
+    """
+    # 第一步：检验图像是否正常：
+    if not check_image_valid(im_source, im_search):
+        return None
+
+    # 第二步：获取特征点集并匹配出特征点对:
+    # 多个目标时最近的几个匹配点都可能是正确的, 所以取k个近邻, 以最远的近邻为参照进行比例筛选
+    kp_sch, kp_src, matches = _get_knn_matches(im_source, im_search, max(max_count, CLUSTER_KNN) + 1, method)
+    good = []
+    for knn in matches:
+        if len(knn) < 2:
+            continue
+        good.extend(m for m in knn[:-1] if m.distance < good_ratio * knn[-1].distance)
+    good = _remove_duplicate_points(sorted(good, key=lambda m: m.distance), kp_src)
+    if len(good) < 4:
+        return None
+
+    # 第三步：根据匹配点对推算目标中心点, 对中心点进行聚类:
+    h, w = im_search.shape[:2]
+    sch_pts = np.float32([kp_sch[m.queryIdx].pt for m in good])
+    src_pts = np.float32([kp_src[m.trainIdx].pt for m in good])
+    scale = np.float32([kp_src[m.trainIdx].size / kp_sch[m.queryIdx].size for m in good])
+    angle = np.radians([kp_src[m.trainIdx].angle - kp_sch[m.queryIdx].angle for m in good])
+    offset = np.float32([w / 2.0, h / 2.0]) - sch_pts
+    cos, sin = np.cos(angle), np.sin(angle)
+    centers = src_pts + scale[:, None] * np.stack([
+        cos * offset[:, 0] - sin * offset[:, 1],
+        sin * offset[:, 0] + cos * offset[:, 1],
+    ], axis=1)
+    eps = max(CLUSTER_RADIUS * min(w, h) * float(np.median(scale)), 2.0)
+    labels = _density_cluster(centers, eps, CLUSTER_MIN_SAMPLES)
+
+    # 第四步：每一类匹配点使用单矩阵映射求出目标区域，据此算出可信度：
+    result = []
+    for label in range(labels.max() + 1):
+        cluster = [m for m, l in zip(good, labels) if l == label]
+        if len(cluster) < 4:
+            continue
+        try:
+            middle_point, pypts, w_h_range = _many_good_pts(im_source, im_search, kp_sch, kp_src, cluster)
+            _target_error_check(w_h_range)
+        except (HomographyError, SiftResultCheckError):
+            continue
+        confidence = _cal_target_confidence(im_source, im_search, w_h_range, rgb)
+        if confidence >= threshold:
+            result.append((generate_result(middle_point, pypts, confidence), w_h_range))
+
+    # 第五步：按可信度排序, 去掉重叠的重复结果:
+    result.sort(key=lambda item: -item[0]["confidence"])
+    kept = []
+    for match, (x_min, x_max, y_min, y_max, _, _) in result:
+        if all(_overlap_ratio((x_min, x_max, y_min, y_max), rect) <= CLUSTER_OVERLAP_RATIO for _, rect in kept):
+            kept.append((match, (x_min, x_max, y_min, y_max)))
+        if len(kept) >= max_count:
+            break
+    print("[aircv][%s] threshold=%s, find_all result=%s" % (method, threshold, [match for match, _ in kept]))
+    return [match for match, _ in kept] or None
+
+
+def _density_cluster(points, eps, min_samples):
+    """对点集进行密度聚类(DBSCAN), 返回每个点的类别编号, 噪声点为-1."""
+    # 按eps划分网格, 与某点距离不超过eps的点只可能位于相邻的9个网格中
+    grid = np.floor(points / eps).astype(int)
+    cells = {}
+    for idx, cell in enumerate(map(tuple, grid)):
+        cells.setdefault(cell, []).append(idx)
+
+    def neighbors(idx):
+        cx, cy = grid[idx]
+        candidates = np.array([j for dx in (-1, 0, 1) for dy in (-1, 0, 1) for j in cells.get((cx + dx, cy + dy), ())])
+        distance = np.hypot(*(points[candidates] - points[idx]).T)
+        return candidates[distance <= eps]
+
+    labels = np.full(len(points), -1, dtype=int)
+    visited = np.zeros(len(points), dtype=bool)
+    cluster = 0
+    for idx in range(len(points)):
+        if visited[idx]:
+            continue
+        visited[idx] = True
+        seeds = neighbors(idx)
+        if len(seeds) < min_samples:
+            # 噪声点, 之后仍可能成为其他类的边界点
+            continue
+        labels[idx] = cluster
+        queue = list(seeds)
+        while queue:
+            j = queue.pop()
+            if labels[j] == -1:
+                labels[j] = cluster
+            if visited[j]:
+                continue
+            visited[j] = True
+            seeds = neighbors(j)
+            if len(seeds) >= min_samples:
+                queue.extend(seeds)
+        cluster += 1
+    return labels
+
+
+def _overlap_ratio(rect1, rect2):
+    """求两个矩形区域(x_min, x_max, y_min, y_max)的交并比."""
+    inter_w = max(0, min(rect1[1], rect2[1]) - max(rect1[0], rect2[0]))
+    inter_h = max(0, min(rect1[3], rect2[3]) - max(rect1[2], rect2[2]))
+    inter = inter_w * inter_h
+    area1 = (rect1[1] - rect1[0]) * (rect1[3] - rect1[2])
+    area2 = (rect2[1] - rect2[0]) * (rect2[3] - rect2[2])
+    union = area1 + area2 - inter
+    return float(inter) / union if union > 0 else 0.0
 
 
 def _init_sift():
     """Make sure that there is SIFT module in OpenCV."""
-    if cv2.__version__.startswith("3."):
+    if hasattr(cv2, "SIFT_create"):
+        # OpenCV>=4.4, sift is in main module.
+        sift = cv2.SIFT_create(edgeThreshold=10)
+    elif cv2.__version__.startswith(("3.", "4.")):
         # OpenCV3.x, sift is in contrib module, you need to compile it seperately.
         try:
             sift = cv2.xfeatures2d.SIFT_create(edgeThreshold=10)
@@ -93,36 +267,160 @@ def _init_sift():
     return sift
 
 
-def _get_key_points(im_source, im_search, good_ratio):
-    """根据传入图像,计算图像所有的特征点,并得到匹配特征点对."""
-    # 准备工作: 初始化sift算子
-    sift = _init_sift()
-    # 第一步：获取特征点集，并匹配出特征点对: 返回值 good, pypts, kp_sch, kp_src
-    kp_sch, des_sch = sift.detectAndCompute(im_search, None)
-    kp_src, des_src = sift.detectAndCompute(im_source, None)
+def _init_binary_detector(method):
+    """初始化二进制特征点算子(orb/akaze/brisk), OpenCV5.x中akaze/brisk位于contrib模块."""
+    if method == "orb":
+        # 截图中的特征点很多, 默认的500个特征点不足以覆盖目标区域
+        return cv2.ORB_create(nfeatures=5000)
+    name = {"akaze": "AKAZE_create", "brisk": "BRISK_create"}.get(method)
+    if name is None:
+        raise NoFeatureModuleError("Unknown key point detector: %s" % method)
+    create = getattr(cv2, name, None) or getattr(getattr(cv2, "xfeatures2d", None), name, None)
+    if create is None:
+        raise NoFeatureModuleError("There is no %s module in your OpenCV environment !" % method.upper())
+    return create()
+
+
+def _get_detector(method="sift"):
+    """获取当前线程的特征点算子, 只在第一次调用时初始化."""
+    detectors = getattr(_LOCAL, "detectors", None)
+    if detectors is None:
+        detectors = _LOCAL.detectors = {}
+    if method not in detectors:
+        detectors[method] = _init_sift() if method == "sift" else _init_binary_detector(method)
+    return detectors[method]
+
+
+def _get_search_features(im_search, method="sift"):
+    """计算模板图像的特征点集, 以图像内容的hash值为key进行缓存, 同一模板只计算一次."""
+    key = (method, hashlib.md5(np.ascontiguousarray(im_search).data).hexdigest(), im_search.shape)
+    features = SEARCH_FEATURES_CACHE.get(key)
+    if features is None:
+        features = _get_detector(method).detectAndCompute(im_search, None)
+        SEARCH_FEATURES_CACHE.set(key, features)
+    return features
+
+
+def _get_matcher(des_src, method="sift"):
+    """
+    对源图像的特征点描述建立索引, 返回的matcher可以复用于不同模板在同一源图像上的匹配.
+    sift使用FLANN的KD树索引, 二进制特征点描述使用汉明距离进行暴力匹配.
+    """
+    if method == "sift":
+        matcher = cv2.FlannBasedMatcher(FLANN_INDEX_PARAMS, FLANN_SEARCH_PARAMS)
+    else:
+        matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    matcher.add([des_src])
+    matcher.train()
+    return matcher
+
+
+class FrameFeatures(object):
+    """
+    Key point features of one frame (screenshot), calculated lazily once for each region of the frame
+    and shared by all the sift (or orb/akaze/brisk) queries against the same frame.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self._features = {}
+        # 每个(method, rect)一把锁, 不同区域或算子的特征点可以并发计算
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, frame):
+        """Get the FrameFeatures of the frame, the latest frames are remembered by identity."""
+        with _FRAME_FEATURES_LOCK:
+            features = FRAME_FEATURES_CACHE.get(id(frame))
+            if features is None or features.frame is not frame:
+                features = cls(frame)
+                FRAME_FEATURES_CACHE.set(id(frame), features)
+            return features
+
+    def get(self, im_region, rect=None, method="sift"):
+        """
+        Get (keypoints, descriptors, matcher) of the region
+
+        Args:
+            im_region: image of the region, a part of the frame
+            rect: region in the frame (x_min, y_min, x_max, y_max), None for the whole frame
+            method: key point detector, sift/orb/akaze/brisk
+
+        Returns:
+            keypoints, descriptors and the matcher trained on the descriptors (None if less than 2 keypoints)
+
+        """
+        key = (method, rect)
+        with self._lock:
+            if key in self._features:
+                return self._features[key]
+            lock = self._locks.setdefault(key, threading.Lock())
+        # 同一区域的并发查询等待第一个查询的计算结果
+        with lock:
+            if key not in self._features:
+                kp, des = _get_detector(method).detectAndCompute(im_region, None)
+                matcher = _get_matcher(des, method) if len(kp) >= 2 else None
+                self._features[key] = (kp, des, matcher)
+            return self._features[key]
+
+
+def _get_frame_region(im_source):
+    """找到im_source所属的完整帧(im_source可能是截图的一个切片), 以及im_source在帧中的区域."""
+    frame = im_source.base
+    if not isinstance(frame, np.ndarray) or frame.ndim != im_source.ndim or frame.strides != im_source.strides:
+        return im_source, None
+    offset = im_source.__array_interface__["data"][0] - frame.__array_interface__["data"][0]
+    y, x = divmod(offset, frame.strides[0])
+    x, remain = divmod(x, frame.strides[1])
+    if remain:
+        return im_source, None
+    h, w = im_source.shape[:2]
+    return frame, (x, y, x + w, y + h)
+
+
+def _get_source_features(im_source, method="sift"):
+    """获取源图像的特征点集, 同一帧的同一区域只计算一次."""
+    frame, rect = _get_frame_region(im_source)
+    return FrameFeatures.of(frame).get(im_source, rect, method)
+
+
+def _get_knn_matches(im_source, im_search, k, method="sift"):
+    """计算图像的特征点, 模板图像的每个特征点在源图像中取出k个最匹配的对应点."""
+    kp_sch, des_sch = _get_search_features(im_search, method)
+    kp_src, des_src, matcher = _get_source_features(im_source, method)
     # When apply knnmatch , make sure that number of features in both test and
     #       query image is greater than or equal to number of nearest neighbors in knn match.
     if len(kp_sch) < 2 or len(kp_src) < 2:
         raise NoSiftMatchPointError("Not enough feature points in input images !")
+    return kp_sch, kp_src, matcher.knnMatch(des_sch, k=min(k, len(kp_src)))
 
+
+def _get_key_points(im_source, im_search, good_ratio, method="sift"):
+    """根据传入图像,计算图像所有的特征点,并得到匹配特征点对."""
+    # 第一步：获取特征点集，并匹配出特征点对: 返回值 good, pypts, kp_sch, kp_src
     # 匹配两个图片中的特征点集，k=2表示每个特征点取出2个最匹配的对应点:
-    matches = FLANN.knnMatch(des_sch, des_src, k=2)
+    kp_sch, kp_src, matches = _get_knn_matches(im_source, im_search, 2, method)
     good = []
     # good为特征点初选结果，剔除掉前两名匹配太接近的特征点，不是独特优秀的特征点直接筛除(多目标识别情况直接不适用)
     for m, n in matches:
         if m.distance < good_ratio * n.distance:
             good.append(m)
-    # good点需要去除重复的部分，（设定源图像不能有重复点）去重时将src图像中的重复点找出即可
+    good = _remove_duplicate_points(good, kp_src)
+
+    return kp_sch, kp_src, good
+
+
+def _remove_duplicate_points(good, kp_src):
+    """good点需要去除重复的部分，（设定源图像不能有重复点）去重时将src图像中的重复点找出即可."""
     # 去重策略：允许搜索图像对源图像的特征点映射一对多，不允许多对一重复（即不能源图像上一个点对应搜索图像的多个点）
-    good_diff, diff_good_point = [], [[]]
+    good_diff, diff_good_point = [], set()
     for m in good:
-        diff_point = [int(kp_src[m.trainIdx].pt[0]), int(kp_src[m.trainIdx].pt[1])]
+        diff_point = int(kp_src[m.trainIdx].pt[0]), int(kp_src[m.trainIdx].pt[1])
         if diff_point not in diff_good_point:
             good_diff.append(m)
-            diff_good_point.append(diff_point)
-    good = good_diff
-
-    return kp_sch, kp_src, good
+            diff_good_point.add(diff_point)
+    return good_diff
 
 
 def _handle_one_good_points(kp_src, good, threshold):
@@ -274,6 +572,14 @@ def _target_error_check(w_h_range):
         raise SiftResultCheckError("Target area is 5 times bigger or 0.2 times smaller than sch_img.")
 
 
+def _cal_target_confidence(im_source, im_search, w_h_range, rgb):
+    """将截图中的识别区域和模板缩放到大小一致, 计算可信度."""
+    x_min, x_max, y_min, y_max, w, h = w_h_range
+    target_img = im_source[y_min:y_max, x_min:x_max]
+    resize_img = cv2.resize(target_img, (w, h))
+    return _cal_sift_confidence(im_search, resize_img, rgb=rgb)
+
+
 def _cal_sift_confidence(im_search, resize_img, rgb=False):
     if rgb:
         confidence = cal_rgb_confidence(im_search, resize_img)
@@ -10,20 +10,34 @@
 
 
 import cv2
+import numpy as np
 from airtest.utils.logger import get_logger
 from .utils import generate_result, check_source_larger_than_search, img_mat_rgb_2_gray
-from .cal_confidence import cal_rgb_confidence
+from .cal_confidence import cal_rgb_confidence, cal_rgb_confidence_batch
 LOGGING = get_logger(__name__)
 
+# 金字塔搜索参数: 最粗层上模板的最小边长(像素), 进入原图精确匹配的候选位置数
+PYRAMID_MIN_SIZE = 16
+PYRAMID_CANDIDATES = 3
+# 多目标识别中非极大值抑制的IoU阈值: 与更优结果的重叠度超过该值的结果被视为重复结果
+NMS_IOU_THRESHOLD = 0.3
 
-def find_template(im_source, im_search, threshold=0.8, rgb=False):
-    """函数功能：找到最优结果."""
+
+def find_template(im_source, im_search, threshold=0.8, rgb=False, pyramid_levels=0):
+    """函数功能：找到最优结果.
+
+    pyramid_levels: 图像金字塔层数, 大于0时先在缩小的图像上粗匹配, 再在原图的候选区域内精确匹配.
+    """
     # 第一步：校验图像输入
     check_source_larger_than_search(im_source, im_search)
-    # 第二步：计算模板匹配的结果矩阵res
-    res = _get_template_result_matrix(im_source, im_search)
-    # 第三步：依次获取匹配结果
-    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+    if pyramid_levels > 0:
+        # 第二步+第三步：由粗到精地求取最优匹配位置
+        max_val, max_loc = _get_pyramid_best_match(im_source, im_search, pyramid_levels)
+    else:
+        # 第二步：计算模板匹配的结果矩阵res
+        res = _get_template_result_matrix(im_source, im_search)
+        # 第三步：依次获取匹配结果
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
     h, w = im_search.shape[:2]
     # 求取可信度:
     confidence = _get_confidence_from_matrix(im_source, im_search, max_loc, max_val, w, h, rgb)
@@ -42,30 +56,51 @@ def find_all_template(im_source, im_search, threshold=0.8, rgb=False, max_count=
     # 第二步：计算模板匹配的结果矩阵res
     res = _get_template_result_matrix(im_source, im_search)
 
-    # 第三步：依次获取匹配结果
-    result = []
+    # 第三步：一次性取出结果矩阵中所有高于阈值的局部极大值点,按匹配值从高到低排列
     h, w = im_search.shape[:2]
+    local_max = cv2.dilate(res, np.ones((3, 3), np.uint8))
+    ys, xs = np.where((res >= threshold) & (res >= local_max))
+    order = np.argsort(-res[ys, xs], kind="mergesort")
+    xs, ys = xs[order], ys[order]
+
+    # 第四步：非极大值抑制,去掉与更优结果重叠的重复结果
+    keep = _non_max_suppression(xs, ys, w, h, NMS_IOU_THRESHOLD)
+    xs, ys = xs[keep], ys[keep]
+
+    # 第五步：批量求取可信度,筛选出可信度达到阈值的结果
+    if rgb and len(xs):
+        img_crops = np.stack([im_source[y:y + h, x:x + w] for x, y in zip(xs, ys)])
+        confidences = cal_rgb_confidence_batch(img_crops, im_search)
+    else:
+        confidences = res[ys, xs]
 
-    while True:
-        # 本次循环中,取出当前结果矩阵中的最优值
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
-        # 求取可信度:
-        confidence = _get_confidence_from_matrix(im_source, im_search, max_loc, max_val, w, h, rgb)
-
-        if confidence < threshold or len(result) > max_count:
-            break
-
+    result = []
+    for x, y, confidence in zip(xs, ys, confidences):
+        if confidence < threshold:
+            continue
         # 求取识别位置: 目标中心 + 目标区域:
-        middle_point, rectangle = _get_target_rectangle(max_loc, w, h)
-        one_good_match = generate_result(middle_point, rectangle, confidence)
+        middle_point, rectangle = _get_target_rectangle((int(x), int(y)), w, h)
+        result.append(generate_result(middle_point, rectangle, float(confidence)))
+        if len(result) >= max_count:
+            break
 
-        result.append(one_good_match)
+    return result if result else None
 
-        # 屏蔽已经取出的最优结果,进入下轮循环继续寻找:
-        # cv2.floodFill(res, None, max_loc, (-1000,), max(max_val, 0), flags=cv2.FLOODFILL_FIXED_RANGE)
-        cv2.rectangle(res, (int(max_loc[0] - w / 2), int(max_loc[1] - h / 2)), (int(max_loc[0] + w / 2), int(max_loc[1] + h / 2)), (0, 0, 0), -1)
 
-    return result if result else None
+def _non_max_suppression(xs, ys, w, h, iou_threshold):
+    """对按匹配值排好序的同大小(w, h)目标区域进行非极大值抑制,返回保留下来的下标."""
+    order = np.arange(len(xs))
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        # 同大小矩形的交集面积只取决于左上角点的偏移量:
+        inter_w = np.maximum(0, w - np.abs(xs[order[1:]] - xs[i]))
+        inter_h = np.maximum(0, h - np.abs(ys[order[1:]] - ys[i]))
+        inter = inter_w * inter_h
+        iou = inter / (2.0 * w * h - inter)
+        order = order[1:][iou <= iou_threshold]
+    return np.array(keep, dtype=int)
 
 
 def _get_confidence_from_matrix(im_source, im_search, max_loc, max_val, w, h, rgb):
@@ -88,6 +123,42 @@ def _get_template_result_matrix(im_source, im_search):
     return cv2.matchTemplate(i_gray, s_gray, cv2.TM_CCOEFF_NORMED)
 
 
+def _get_pyramid_best_match(im_source, im_search, levels):
+    """图像金字塔搜索: 在缩小2^levels倍的图像上求出候选位置, 再在原图候选位置附近的窗口内精确匹配."""
+    s_gray, i_gray = img_mat_rgb_2_gray(im_search), img_mat_rgb_2_gray(im_source)
+    h, w = s_gray.shape[:2]
+    h_src, w_src = i_gray.shape[:2]
+    # 保证最粗层上的模板不会过小, 否则逐层减少金字塔层数:
+    while levels > 0 and min(h, w) >> levels < PYRAMID_MIN_SIZE:
+        levels -= 1
+    if levels == 0:
+        res = cv2.matchTemplate(i_gray, s_gray, cv2.TM_CCOEFF_NORMED)
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+        return max_val, max_loc
+
+    scale = 2 ** levels
+    s_small = cv2.resize(s_gray, (w // scale, h // scale), interpolation=cv2.INTER_AREA)
+    i_small = cv2.resize(i_gray, (w_src // scale, h_src // scale), interpolation=cv2.INTER_AREA)
+    res = cv2.matchTemplate(i_small, s_small, cv2.TM_CCOEFF_NORMED)
+    h_small, w_small = s_small.shape[:2]
+    best_val, best_loc = -1.0, (0, 0)
+    for _ in range(PYRAMID_CANDIDATES):
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+        # 在原图中取候选位置外扩2个粗层像素的窗口(窗口不能小于模板):
+        x_min = min(max(max_loc[0] * scale - 2 * scale, 0), w_src - w)
+        y_min = min(max(max_loc[1] * scale - 2 * scale, 0), h_src - h)
+        x_max = min(max_loc[0] * scale + 2 * scale + w, w_src)
+        y_max = min(max_loc[1] * scale + 2 * scale + h, h_src)
+        res_fine = cv2.matchTemplate(i_gray[y_min:y_max, x_min:x_max], s_gray, cv2.TM_CCOEFF_NORMED)
+        min_val, fine_val, min_loc, fine_loc = cv2.minMaxLoc(res_fine)
+        if fine_val > best_val:
+            best_val, best_loc = fine_val, (fine_loc[0] + x_min, fine_loc[1] + y_min)
+        # 屏蔽已经取出的候选位置,继续寻找下一个候选:
+        cv2.rectangle(res, (int(max_loc[0] - w_small / 2), int(max_loc[1] - h_small / 2)),
+                      (int(max_loc[0] + w_small / 2), int(max_loc[1] + h_small / 2)), (-1,), -1)
+    return best_val, best_loc
+
+
 def _get_target_rectangle(left_top_pos, w, h):
     """根据左上角点和宽高求出目标区域."""
     x_min, y_min = left_top_pos
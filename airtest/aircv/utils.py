@@ -6,6 +6,10 @@ import numpy as np
 from .error import TemplateInputError
 from PIL import Image
 
+# 帧指纹参数: 缩略图的最大宽度, 缩略图像素的灰度差超过FRAME_DIFF_TOLERANCE才视为发生了变化
+FRAME_THUMBNAIL_WIDTH = 160
+FRAME_DIFF_TOLERANCE = 4
+
 
 def generate_result(middle_point, pypts, confi):
     """Format the result: 定义图像识别结果格式."""
@@ -37,18 +41,55 @@ def img_mat_rgb_2_gray(img_mat):
     """
     Turn img_mat into gray_scale, so that template match can figure the img data.
     "print(type(im_search[0][0])")  can check the pixel type.
+    Gray scale input is returned as it is.
     """
+    if img_mat.ndim == 2:
+        return img_mat
     assert isinstance(img_mat[0][0], np.ndarray), "input must be instance of np.ndarray"
     return cv2.cvtColor(img_mat, cv2.COLOR_BGR2GRAY)
 
 
+def frame_fingerprint(img):
+    """计算帧指纹: 缩小后的灰度图, 用于快速判断两帧画面是否发生了变化."""
+    h, w = img.shape[:2]
+    width = min(w, FRAME_THUMBNAIL_WIDTH)
+    height = max(1, int(round(1.0 * h * width / w)))
+    return cv2.resize(img_mat_rgb_2_gray(img), (width, height), interpolation=cv2.INTER_AREA)
+
+
+def frame_changed(fingerprint1, fingerprint2, ratio=0):
+    """根据帧指纹判断画面是否发生了变化: 发生变化的像素比例超过ratio时视为变化."""
+    if fingerprint1 is None or fingerprint2 is None or fingerprint1.shape != fingerprint2.shape:
+        return True
+    changed_pixels = cv2.absdiff(fingerprint1, fingerprint2) > FRAME_DIFF_TOLERANCE
+    return changed_pixels.mean() > ratio
+
+
+def frame_diff_rects(fingerprint1, fingerprint2, resolution):
+    """根据同样大小的两个帧指纹求出画面发生变化的区域, 返回原图坐标下的矩形列表[(x_min, y_min, x_max, y_max), ...]."""
+    changed_pixels = (cv2.absdiff(fingerprint1, fingerprint2) > FRAME_DIFF_TOLERANCE).astype(np.uint8)
+    # 缩略图的一个像素对应原图的一块区域, 向外扩张一个像素以保证覆盖全部变化:
+    changed_pixels = cv2.dilate(changed_pixels, np.ones((3, 3), np.uint8))
+    _, _, stats, _ = cv2.connectedComponentsWithStats(changed_pixels)
+    w, h = resolution
+    thumb_h, thumb_w = fingerprint1.shape[:2]
+    scale_x, scale_y = 1.0 * w / thumb_w, 1.0 * h / thumb_h
+    rects = []
+    # 第0个连通域为背景(未变化的像素):
+    for x, y, rect_w, rect_h, _ in stats[1:]:
+        rects.append((int(x * scale_x), int(y * scale_y),
+                      min(w, int(np.ceil((x + rect_w) * scale_x))), min(h, int(np.ceil((y + rect_h) * scale_y)))))
+    return rects
+
+
 def img_2_string(img):
     _, png = cv2.imencode('.png', img)
     return png.tostring()
 
 
 def string_2_img(pngstr):
-    nparr = np.fromstring(pngstr, np.uint8)
+    # pngstr may be bytes or any buffer such as memoryview, no copy is made before decoding
+    nparr = np.frombuffer(pngstr, np.uint8)
     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
     return img
 
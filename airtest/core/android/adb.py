@@ -6,12 +6,14 @@ import time
 import random
 import platform
 import warnings
+import socket
 import subprocess
 import threading
 
 from six import PY3, text_type, binary_type
 from six.moves import reduce
 
+from airtest.core.android.adbclient import AdbClient, ShellPool, ShellSessionError, is_server_down
 from airtest.core.android.constant import (DEFAULT_ADB_PATH, IP_PATTERN,
                                            SDK_VERISON_NEW)
 from airtest.core.error import (AdbError, AdbShellError, AirtestError,
@@ -32,13 +34,27 @@ class ADB(object):
     status_device = "device"
     status_offline = "offline"
     SHELL_ENCODING = "utf-8"
-
-    def __init__(self, serialno=None, adb_path=None, server_addr=None):
+    # run shell/exec-out/push/pull/forward/get-state/... by the adb host protocol client instead of adb processes
+    NATIVE = False
+    # max number of long-lived remote shells per device to run `shell` commands in, 0 to start a shell per command
+    SHELL_SESSIONS = 0
+    # seconds before the cached values of mutable properties (not `ro.*`) are read from the device again
+    PROPS_TTL = 5
+
+    def __init__(self, serialno=None, adb_path=None, server_addr=None, native=None, shell_sessions=None):
         self.serialno = serialno
         self.adb_path = adb_path or self.builtin_adb_path()
         self._set_cmd_options(server_addr)
+        self.native = self.NATIVE if native is None else native
+        self.client = AdbClient(self.host, self.port, self.serialno)
+        self.shell_sessions = self.SHELL_SESSIONS if shell_sessions is None else shell_sessions
+        self._shell_pool = None
+        self._shell_pool_lock = threading.Lock()
         self.connect()
         self._sdk_version = None
+        self._props = None
+        self._props_time = 0
+        self._props_lock = threading.Lock()
         self._line_breaker = None
         self._display_info = {}
         self._display_info_lock = threading.Lock()
@@ -169,14 +185,13 @@ class ADB(object):
             command(s) standard output (stdout)
 
         """
-        proc = self.start_cmd(cmds, device)
-        stdout, stderr = proc.communicate()
+        stdout, stderr, returncode = self._run_cmd(cmds, device)
 
         if ensure_unicode:
             stdout = stdout.decode(get_std_encoding(sys.stdout))
             stderr = stderr.decode(get_std_encoding(sys.stderr))
 
-        if proc.returncode > 0:
+        if returncode > 0:
             # adb connection error
             pattern = DeviceConnectionError.DEVICE_CONNECTION_ERROR
             if isinstance(stderr, binary_type):
@@ -187,6 +202,97 @@ class ADB(object):
                 raise AdbError(stdout, stderr)
         return stdout
 
+    def _run_cmd(self, cmds, device=True):
+        """
+        Run the adb command(s) by the host protocol client if possible, otherwise in subprocess
+
+        Args:
+            cmds: command(s) to be run
+            device: if True, the device serial number must be specified
+
+        Returns:
+            stdout, stderr and return code
+
+        """
+        if self.native:
+            result = self._native_cmd(cmds, device)
+            if result is not None:
+                return result
+        proc = self.start_cmd(cmds, device)
+        stdout, stderr = proc.communicate()
+        return stdout, stderr, proc.returncode
+
+    def _native_cmd(self, cmds, device=True):
+        """
+        Run the adb command(s) by the host protocol client, the outputs are in the same format as the adb process
+
+        Args:
+            cmds: command(s) to be run
+            device: if True, the device serial number must be specified
+
+        Raises:
+            RuntimeError: if `device` is True and serialno is not specified
+
+        Returns:
+            stdout, stderr and return code, None if the command is not supported by the client
+
+        """
+        if device and not self.serialno:
+            raise RuntimeError("please set serialno first")
+        cmds = split_cmd(cmds)
+        try:
+            return self._native_call(self._run_native_cmd, cmds[0], cmds[1:])
+        except AdbError as err:
+            # failure replied by the adb server
+            return b"", ("error: %s\n" % err.stderr).encode("utf-8"), 1
+
+    def _native_call(self, func, *args):
+        """call `func` with the host protocol client, start the adb server first if it is not running"""
+        try:
+            return func(*args)
+        except socket.error as err:
+            if not is_server_down(err):
+                raise
+            self.start_server()
+            return func(*args)
+
+    def _run_native_cmd(self, name, args):
+        client = self.client
+        if name == "shell":
+            stdout, stderr, exit_code = client.shell(" ".join(args))
+            return stdout, stderr, exit_code or 0
+        elif name == "exec-out":
+            return client.exec_out("exec:" + " ".join(args)), b"", 0
+        elif name == "push" and len(args) == 2 and os.path.isfile(args[0]):
+            # directories are pushed by the adb process
+            client.push(*args)
+        elif name == "pull" and len(args) == 2:
+            client.pull(*args)
+        elif name == "forward":
+            if args == ["--list"]:
+                return client.list_forward().encode("utf-8"), b"", 0
+            elif args[:1] == ["--remove"]:
+                client.remove_forward(args[1])
+            elif args == ["--remove-all"]:
+                client.remove_forward()
+            else:
+                local, remote = [arg for arg in args if arg != "--no-rebind"]
+                client.forward(local, remote, no_rebind="--no-rebind" in args)
+        elif name == "get-state":
+            return (client.get_state() + "\n").encode("utf-8"), b"", 0
+        elif name == "devices":
+            lines = ["List of devices attached"] + ["%s\t%s" % device for device in client.devices()]
+            return ("\n".join(lines) + "\n\n").encode("utf-8"), b"", 0
+        elif name in ("connect", "disconnect") and len(args) == 1:
+            if name == "connect":
+                out = client.connect_device(args[0])
+            else:
+                out = client.disconnect_device(args[0])
+            return (out + "\n").encode("utf-8"), b"", 0
+        else:
+            return None
+        return b"", b"", 0
+
     def close_proc_pipe(self, proc):
         """close stdin/stdout/stderr of subprocess.Popen."""
 
@@ -209,10 +315,15 @@ class ADB(object):
             list od adb devices
 
         """
-        patten = re.compile(r'^[\w\d.:-]+\t[\w]+$')
-        device_list = []
         # self.start_server()
         output = self.cmd("devices", device=False)
+        return self._parse_devices(output, state)
+
+    @staticmethod
+    def _parse_devices(output, state=None):
+        """parse the output of `adb devices` into a list of (serialno, state)"""
+        patten = re.compile(r'^[\w\d.:-]+\t[\w]+$')
+        device_list = []
         for line in output.splitlines():
             line = line.strip()
             if not line or not patten.match(line):
@@ -260,13 +371,12 @@ class ADB(object):
             None if status is `not found`, otherwise return the standard output from `adb get-state` command
 
         """
-        proc = self.start_cmd("get-state")
-        stdout, stderr = proc.communicate()
+        stdout, stderr, returncode = self._run_cmd("get-state")
 
         stdout = stdout.decode(get_std_encoding(sys.stdout))
         stderr = stderr.decode(get_std_encoding(sys.stdout))
 
-        if proc.returncode == 0:
+        if returncode == 0:
             return stdout.strip()
         elif "not found" in stderr:
             return None
@@ -287,6 +397,13 @@ class ADB(object):
             None
 
         """
+        if self.native:
+            client = AdbClient(self.host, self.port, self.serialno, timeout=timeout)
+            try:
+                self._native_call(client.wait_for_device)
+            except (socket.error, AdbError):
+                raise DeviceConnectionError("device not ready")
+            return
         proc = self.start_cmd("wait-for-device")
         timer = threading.Timer(timeout, proc.kill)
         timer.start()
@@ -326,6 +443,9 @@ class ADB(object):
         out = self.cmd(cmds, ensure_unicode=False)
         if not ensure_unicode:
             return out
+        return self._decode_shell_output(out)
+
+    def _decode_shell_output(self, out):
         # use shell encoding to decode output
         try:
             return out.decode(self.SHELL_ENCODING)
@@ -333,6 +453,21 @@ class ADB(object):
             warnings.warn("shell output decode {} fail. repr={}".format(self.SHELL_ENCODING, repr(out)))
             return text_type(repr(out))
 
+    @property
+    def shell_pool(self):
+        """
+        Pool of long-lived remote shells used by `shell` when `shell_sessions` is set
+
+        Returns:
+            ShellPool
+
+        """
+        with self._shell_pool_lock:
+            if self._shell_pool is None:
+                self._shell_pool = ShellPool(self.client, self.shell_sessions)
+                reg_cleanup(self._shell_pool.close)
+            return self._shell_pool
+
     def shell(self, cmd):
         """
         Run the `adb shell` command on the device
@@ -347,19 +482,29 @@ class ADB(object):
             command output
 
         """
+        if self.shell_sessions:
+            # exit code is delimited by the session, no matter which sdk version
+            try:
+                stdout, stderr, returncode = self._native_call(self.shell_pool.run, " ".join(split_cmd(cmd)))
+            except AdbError as err:
+                raise AdbShellError(err.stdout, err.stderr)
+            except ShellSessionError as err:
+                # the command is not written to the session, it is safe to run it again
+                LOGGING.warning("shell session failed: %r, run the command by a one-shot shell", err)
+            except socket.error as err:
+                # the command may have been run, e.g. `pm install`, so it must not be run again,
+                # the broken or timed out session has been discarded by the pool
+                raise AdbShellError("", "shell session failed: %r" % err)
+            else:
+                stdout, stderr = self._decode_shell_output(stdout), self._decode_shell_output(stderr)
+                if returncode > 0:
+                    raise AdbShellError(stdout, stderr)
+                return stdout
         if self.sdk_version < SDK_VERISON_NEW:
             # for sdk_version < 25, adb shell do not raise error
             # https://stackoverflow.com/questions/9379400/adb-error-codes
             cmd = split_cmd(cmd) + [";", "echo", "---$?---"]
-            out = self.raw_shell(cmd).rstrip()
-            m = re.match("(.*)---(\d+)---$", out, re.DOTALL)
-            if not m:
-                warnings.warn("return code not matched")
-                stdout = out
-                returncode = 0
-            else:
-                stdout = m.group(1)
-                returncode = int(m.group(2))
+            stdout, returncode = self._split_returncode(self.raw_shell(cmd))
             if returncode > 0:
                 raise AdbShellError("", stdout)
             return stdout
@@ -371,6 +516,43 @@ class ADB(object):
             else:
                 return out
 
+    @staticmethod
+    def _split_returncode(out):
+        """split the output of the shell command ending with `echo ---$?---` into output and return code"""
+        out = out.rstrip()
+        m = re.match("(.*)---(\d+)---$", out, re.DOTALL)
+        if not m:
+            warnings.warn("return code not matched")
+            return out, 0
+        return m.group(1), int(m.group(2))
+
+    def shell_batch(self, cmds):
+        """
+        Run several shell commands in one `adb shell` invocation, the output of each command is delimited
+        by a line with a random token and its exit code
+
+        Args:
+            cmds: list of commands, each one a string or a list of arguments
+
+        Raises:
+            AdbShellError: if the outputs of some commands are missing
+
+        Returns:
+            list of (output, return code), one for each command
+
+        """
+        token = "AIRTEST_BATCH_%d" % random.randint(0, 1 << 30)
+        # the token is quoted so that the echoed command line does not match it
+        quoted = '"%s""%s' % (token[:8], token[8:])
+        script = "".join('%s; echo %s %d $?"; ' % (" ".join(split_cmd(cmd)), quoted, i) for i, cmd in enumerate(cmds))
+        out = self.raw_shell([script.rstrip("; ")])
+        results = []
+        for output, _, returncode in re.findall(r"(.*?)\r?%s (\d+) (\d+)\r*\n" % token, out, re.S):
+            results.append((output, int(returncode)))
+        if len(results) != len(cmds):
+            raise AdbShellError(out, "outputs of %d commands missing" % (len(cmds) - len(results)))
+        return results
+
     def keyevent(self, keyname):
         """
         Perform `adb shell input keyevent` command on the device
@@ -386,20 +568,72 @@ class ADB(object):
 
     def getprop(self, key, strip=True):
         """
-        Perform `adb shell getprop` on the device
+        Get the property of the device, read from the cached `getprop` dump, see `getprops`
+
+        Read-only properties (`ro.*`) are cached until `refresh_props` is called,
+        the others are read again when the cache is older than `PROPS_TTL` seconds
 
         Args:
             key: key value for property
-            strip: True or False to strip the return carriage and line break from returned string
+            strip: True or False to strip the return carriage and line break from returned string,
+                `adb shell getprop key` is performed when False
 
         Returns:
             propery value
 
         """
-        prop = self.raw_shell(['getprop', key])
-        if strip:
-            prop = prop.rstrip('\r\n')
-        return prop
+        if not strip:
+            return self.raw_shell(['getprop', key])
+        max_age = None if key.startswith("ro.") else self.PROPS_TTL
+        props = self.getprops(max_age)
+        if key in props:
+            return props[key]
+        # the key may be missing if the dump is not parsed as expected, read it alone
+        return self.raw_shell(['getprop', key]).strip()
+
+    def getprops(self, max_age=None):
+        """
+        Get all the properties of the device by one `adb shell getprop`, the result is cached
+
+        Args:
+            max_age: seconds, read the properties again if the cache is older than this, None to use the cache anyway
+
+        Returns:
+            dict of properties
+
+        """
+        with self._props_lock:
+            if self._props is None or (max_age is not None and time.time() - self._props_time > max_age):
+                self._props = self._parse_props(self.raw_shell("getprop"))
+                self._props_time = time.time()
+            return self._props
+
+    def refresh_props(self):
+        """
+        Drop the cached properties, they are read from the device again on next `getprop`
+
+        Returns:
+            None
+
+        """
+        with self._props_lock:
+            self._props = None
+            self._sdk_version = None
+
+    @staticmethod
+    def _parse_props(output):
+        """
+        Parse the output of `getprop`, lines like `[ro.build.version.sdk]: [25]`, the line ending may be
+        `\\r\\r\\n` if the output of a pty is converted again on Windows
+
+        Args:
+            output: `getprop` output
+
+        Returns:
+            dict of properties
+
+        """
+        return dict(re.findall(r"^\[([^\]\n]+)\]: \[(.*?)\]\r*$", output, re.M | re.S))
 
     @property
     def sdk_version(self):
@@ -473,15 +707,22 @@ class ADB(object):
 
         """
         out = self.cmd(['forward', '--list'])
-        for line in out.splitlines():
+        for forward in self._parse_forwards(out):
+            yield forward
+
+    @staticmethod
+    def _parse_forwards(output):
+        """parse the output of `adb forward --list` into a list of (serialno, local, remote)"""
+        forwards = []
+        for line in output.splitlines():
             line = line.strip()
             if not line:
                 continue
             cols = line.split()
             if len(cols) != 3:
                 continue
-            serialno, local, remote = cols
-            yield serialno, local, remote
+            forwards.append(tuple(cols))
+        return forwards
 
     @classmethod
     def get_available_forward_local(cls):
@@ -558,13 +799,16 @@ class ADB(object):
         else:
             cmds = ["install", "-r", filepath]
         out = self.cmd(cmds)
+        self._check_install_output(out)
+        return out
 
+    @staticmethod
+    def _check_install_output(out):
+        """raise AirtestError if the output of `adb install` reports failure"""
         if re.search(r"Failure \[.*?\]", out):
             print(out)
             raise AirtestError("Installation Failure")
 
-        return out
-
     def install_multiple_app(self, filepath, replace=False):
         """
             Perform `adb install-multiple` command
@@ -595,10 +839,7 @@ class ADB(object):
             else:
                 return self.install_app(filepath, replace)
 
-        if re.search(r"Failure \[.*?\]", out):
-            print(out)
-            raise AirtestError("Installation Failure")
-
+        self._check_install_output(out)
         return out
 
     def pm_install(self, filepath, replace=False):
@@ -669,6 +910,18 @@ class ADB(object):
         raw = self.cmd('shell screencap -p', ensure_unicode=False)
         return raw.replace(self.line_breaker, b"\n")
 
+    def raw_snapshot(self):
+        """
+        Take the raw framebuffer of the device display by `exec-out screencap`, no PNG encoding on the device
+        and no line breaker replacing on the host
+
+        Returns:
+            command output (stdout): header (width, height, pixel format and color space on Android 9+)
+            followed by the pixels
+
+        """
+        return self.cmd('exec-out screencap', ensure_unicode=False)
+
     # PEP 3113 -- Removal of Tuple Parameter Unpacking
     # https://www.python.org/dev/peps/pep-3113/
     def touch(self, tuple_xy):
@@ -787,7 +1040,13 @@ class ADB(object):
             None
         """
         for local in self._forward_local_using:
-            self.start_cmd(["forward", "--remove", local])
+            if self.native:
+                try:
+                    self.client.remove_forward(local)
+                except Exception:
+                    pass
+            else:
+                self.start_cmd(["forward", "--remove", local])
 
         self._forward_local_using = []
 
@@ -801,10 +1060,11 @@ class ADB(object):
 
         """
         if not self._line_breaker:
+            # the host protocol client does not translate the line breaks as the adb process on windows
             if self.sdk_version >= SDK_VERISON_NEW:
-                line_breaker = os.linesep
+                line_breaker = "\n" if self.native else os.linesep
             else:
-                line_breaker = '\r' + os.linesep
+                line_breaker = '\r\n' if self.native else '\r' + os.linesep
             self._line_breaker = line_breaker.encode("ascii")
         return self._line_breaker
 
@@ -834,9 +1094,12 @@ class ADB(object):
             device screen properties
 
         """
-        display_info = self.getPhysicalDisplayInfo()
-        orientation = self.getDisplayOrientation()
-        max_x, max_y = self.getMaxXY()
+        display_info, orientation, (max_x, max_y) = self._run_probes([
+            self._physical_display_probes(),
+            self._orientation_probes(),
+            [("getevent -p", self._parse_max_xy)],
+        ])
+        orientation = self._check_orientation(orientation)
         display_info.update({
             "orientation": orientation,
             "rotation": orientation * 90,
@@ -853,7 +1116,38 @@ class ADB(object):
             max x and max y coordinates
 
         """
-        ret = self.shell('getevent -p').split('\n')
+        return self._parse_max_xy(self.shell('getevent -p'))
+
+    def _run_probes(self, probe_lists):
+        """
+        Run several probes with as few `shell_batch` as possible, the first probe of every list is run
+        in one batch, the fallbacks are run in another batch only for the lists whose first output can't be parsed
+
+        Args:
+            probe_lists: list of probes, each one a list of (command, parse function) in priority order,
+                the parse function returns None if the output can't be parsed
+
+        Returns:
+            list of the parsed results, None if all the probes of the list fail
+
+        """
+        results = [None] * len(probe_lists)
+        rounds = [[(i, probes[0]) for i, probes in enumerate(probe_lists)],
+                  [(i, probe) for i, probes in enumerate(probe_lists) for probe in probes[1:]]]
+        for probes in rounds:
+            probes = [(i, probe) for i, probe in probes if results[i] is None]
+            if not probes:
+                continue
+            outputs = self.shell_batch([cmd for _, (cmd, _) in probes])
+            for (i, (_, parse)), (out, _) in zip(probes, outputs):
+                if results[i] is None:
+                    results[i] = parse(out)
+        return results
+
+    @staticmethod
+    def _parse_max_xy(output):
+        """parse max x and max y of the touch screen from the output of `getevent -p`"""
+        ret = output.split('\n')
         max_x, max_y = None, None
         for i in ret:
             if i.find("0035") != -1:
@@ -898,8 +1192,20 @@ class ADB(object):
             physical display info for dimension and density
 
         """
+        return self._run_probes([self._physical_display_probes()])[0]
+
+    def _physical_display_probes(self):
+        """probes of the physical display info in priority order, see `_run_probes`"""
+        return [
+            ("dumpsys display", self._parse_display_info_from_display),
+            ("dumpsys window", self._parse_display_info_from_window),
+            ("wm size; wm density", self._parse_display_info_from_wm),
+        ]
+
+    @staticmethod
+    def _parse_display_info_from_display(out):
+        """parse the display info from the output of `dumpsys display`"""
         phyDispRE = re.compile('.*PhysicalDisplayInfo{(?P<width>\d+) x (?P<height>\d+), .*, density (?P<density>[\d.]+).*')
-        out = self.raw_shell('dumpsys display')
         m = phyDispRE.search(out)
         if m:
             displayInfo = {}
@@ -910,11 +1216,12 @@ class ADB(object):
                 displayInfo[prop] = float(m.group(prop))
             return displayInfo
 
+    def _parse_display_info_from_window(self, out):
+        """parse the display info from the output of `dumpsys window`"""
         # This could also be mSystem or mOverscanScreen
         phyDispRE = re.compile('\s*mUnrestrictedScreen=\((?P<x>\d+),(?P<y>\d+)\) (?P<width>\d+)x(?P<height>\d+)')
         # This is known to work on older versions (i.e. API 10) where mrestrictedScreen is not available
         dispWHRE = re.compile('\s*DisplayWidth=(?P<width>\d+) *DisplayHeight=(?P<height>\d+)')
-        out = self.raw_shell('dumpsys window')
         m = phyDispRE.search(out, 0)
         if not m:
             m = dispWHRE.search(out, 0)
@@ -931,9 +1238,12 @@ class ADB(object):
                     displayInfo[prop] = -1.0
             return displayInfo
 
+    @staticmethod
+    def _parse_display_info_from_wm(out):
+        """parse the display info from the output of `wm size; wm density`"""
         # gets C{mPhysicalDisplayInfo} values from dumpsys. This is a method to obtain display dimensions and density
         phyDispRE = re.compile('Physical size: (?P<width>\d+)x(?P<height>\d+).*Physical density: (?P<density>\d+)', re.S)
-        m = phyDispRE.search(self.raw_shell('wm size; wm density'))
+        m = phyDispRE.search(out)
         if m:
             displayInfo = {}
             for prop in ['width', 'height']:
@@ -971,24 +1281,41 @@ class ADB(object):
             display orientation information
 
         """
+        return self._check_orientation(self._run_probes([self._orientation_probes()])[0])
+
+    def _orientation_probes(self):
+        """probes of the display orientation in priority order, see `_run_probes`"""
+        return [
+            ("dumpsys SurfaceFlinger", self._parse_orientation_from_surface_flinger),
+            ("dumpsys input", self._parse_orientation_from_input),
+        ]
+
+    @staticmethod
+    def _parse_orientation_from_surface_flinger(out):
+        """parse the display orientation from the output of `dumpsys SurfaceFlinger`"""
         # another way to get orientation, for old sumsung device(sdk version 15) from xiaoma
         SurfaceFlingerRE = re.compile('orientation=(\d+)')
-        output = self.shell('dumpsys SurfaceFlinger')
-        m = SurfaceFlingerRE.search(output)
+        m = SurfaceFlingerRE.search(out)
         if m:
             return int(m.group(1))
 
+    @staticmethod
+    def _parse_orientation_from_input(out):
+        """parse the display orientation from the output of `dumpsys input`"""
         # Fallback method to obtain the orientation
         # See https://github.com/dtmilano/AndroidViewClient/issues/128
         surfaceOrientationRE = re.compile('SurfaceOrientation:\s+(\d+)')
-        output = self.shell('dumpsys input')
-        m = surfaceOrientationRE.search(output)
+        m = surfaceOrientationRE.search(out)
         if m:
             return int(m.group(1))
 
-        # We couldn't obtain the orientation
-        warnings.warn("Could not obtain the orientation, return 0")
-        return 0
+    @staticmethod
+    def _check_orientation(orientation):
+        if orientation is None:
+            # We couldn't obtain the orientation
+            warnings.warn("Could not obtain the orientation, return 0")
+            return 0
+        return orientation
 
     def get_top_activity(self):
         """
@@ -1001,7 +1328,11 @@ class ADB(object):
             top activity as a tuple
 
         """
-        dat = self.shell('dumpsys activity top')
+        return self._parse_top_activity(self.shell('dumpsys activity top'))
+
+    @staticmethod
+    def _parse_top_activity(dat):
+        """parse (package, activity, pid) of the top activity from the output of `dumpsys activity top`"""
         activityRE = re.compile('\s*ACTIVITY ([A-Za-z0-9_.]+)/([A-Za-z0-9_.]+) \w+ pid=(\d+)')
         # in Android8.0 or higher, the result may be more than one
         m = activityRE.findall(dat)
@@ -1034,8 +1365,13 @@ class ADB(object):
             True or False whether the screen is turned on or off
 
         """
+        return self._parse_screen_on(self.shell('dumpsys window policy'))
+
+    @staticmethod
+    def _parse_screen_on(output):
+        """parse the screen on state from the output of `dumpsys window policy`"""
         screenOnRE = re.compile('mScreenOnFully=(true|false)')
-        m = screenOnRE.search(self.shell('dumpsys window policy'))
+        m = screenOnRE.search(output)
         if m:
             return (m.group(1) == 'true')
         raise AirtestError("Couldn't determine screen ON state")
@@ -1054,12 +1390,36 @@ class ADB(object):
             Does not work on Xiaomi 2S
 
         """
+        return self._parse_locked(self.shell('dumpsys window policy'))
+
+    @staticmethod
+    def _parse_locked(output):
+        """parse the lock screen state from the output of `dumpsys window policy`"""
         lockScreenRE = re.compile('mShowingLockscreen=(true|false)')
-        m = lockScreenRE.search(self.shell('dumpsys window policy'))
+        m = lockScreenRE.search(output)
         if not m:
             raise AirtestError("Couldn't determine screen lock state")
         return (m.group(1) == 'true')
 
+    def get_screen_status(self):
+        """
+        Get the screen on/lock state and the top activity by one `adb shell`
+
+        Returns:
+            dict of `screenon`, `locked` and `top_activity`, the value is None if it can't be detected
+
+        """
+        (policy, _), (activity, _) = self.shell_batch(['dumpsys window policy', 'dumpsys activity top'])
+        status = {}
+        for key, parse, output in (("screenon", self._parse_screen_on, policy),
+                                   ("locked", self._parse_locked, policy),
+                                   ("top_activity", self._parse_top_activity, activity)):
+            try:
+                status[key] = parse(output)
+            except AirtestError:
+                status[key] = None
+        return status
+
     def unlock(self):
         """
         Perform `adb shell input keyevent MENU` and `adb shell input keyevent BACK` commands to attempt
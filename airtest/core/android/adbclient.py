@@ -0,0 +1,572 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import stat
+import time
+import errno
+import shlex
+import struct
+import socket
+import threading
+
+from six import text_type
+
+from airtest.core.error import AdbError
+from airtest.utils.safesocket import SafeSocket
+
+
+class AdbClient(object):
+    """
+    Client of the adb server speaking the adb host protocol over a socket, it runs the adb services
+    (`host:*`, `shell:`, `exec:`, `sync:`) without starting an adb process for each command
+
+    reference https://android.googlesource.com/platform/packages/modules/adb/+/refs/heads/master/SERVICES.TXT
+
+    Args:
+        host: adb server host
+        port: adb server port
+        serialno: serial number of the device
+        timeout: socket timeout in seconds, None means blocking
+
+    """
+
+    # max size of a sync DATA packet
+    SYNC_DATA_MAX = 64 * 1024
+    # packet ids of shell protocol v2
+    SHELL_ID_STDOUT = 1
+    SHELL_ID_STDERR = 2
+    SHELL_ID_EXIT = 3
+    SHELL_ID_CLOSE_STDIN = 4
+
+    def __init__(self, host="127.0.0.1", port=5037, serialno=None, timeout=None):
+        self.host = host
+        self.port = int(port)
+        self.serialno = serialno
+        self.timeout = timeout
+        self._features = None
+
+    def connect(self):
+        """
+        Connect to the adb server
+
+        Raises:
+            socket.error: if the adb server is not running
+
+        Returns:
+            SafeSocket connected
+
+        """
+        s = SafeSocket(socket.create_connection((self.host, self.port), timeout=self.timeout))
+        return s
+
+    def request(self, s, service):
+        """
+        Send a service request and read the status
+
+        Args:
+            s: SafeSocket connected to the adb server
+            service: service name, e.g. `host:version`
+
+        Raises:
+            AdbError: if the adb server replies FAIL
+
+        Returns:
+            None
+
+        """
+        s.send(encode_request(service))
+        self._read_status(s)
+
+    def host_query(self, service):
+        """
+        Run a host service which replies a length prefixed message, e.g. `host:devices`
+
+        Args:
+            service: service name
+
+        Returns:
+            reply message (bytes)
+
+        """
+        s = self.connect()
+        try:
+            self.request(s, service)
+            return self._read_message(s)
+        finally:
+            s.close()
+
+    def host_command(self, service):
+        """
+        Run a host service which replies a second status when done, e.g. `host-serial:<serial>:forward:...`
+
+        Args:
+            service: service name
+
+        Returns:
+            None
+
+        """
+        s = self.connect()
+        try:
+            self.request(s, service)
+            self._read_status(s)
+        finally:
+            s.close()
+
+    def transport(self):
+        """
+        Connect to the device, the socket can be used for one device service after that
+
+        Returns:
+            SafeSocket connected to the device
+
+        """
+        s = self.connect()
+        try:
+            self.request(s, "host:transport:%s" % self.serialno if self.serialno else "host:transport-any")
+        except Exception:
+            s.close()
+            raise
+        return s
+
+    def open_service(self, service):
+        """
+        Open a device service, e.g. `shell:ls`, the service reads/writes through the returned socket
+
+        Args:
+            service: device service name
+
+        Returns:
+            SafeSocket of the service
+
+        """
+        s = self.transport()
+        try:
+            self.request(s, service)
+        except Exception:
+            s.close()
+            raise
+        return s
+
+    def _host_serial(self, service):
+        return "host-serial:%s:%s" % (self.serialno, service)
+
+    def devices(self):
+        """
+        Returns:
+            list of (serialno, state)
+
+        """
+        out = self.host_query("host:devices").decode("utf-8")
+        return [tuple(line.split("\t")[:2]) for line in out.splitlines() if "\t" in line]
+
+    def get_state(self):
+        return self.host_query(self._host_serial("get-state")).decode("utf-8")
+
+    def wait_for_device(self):
+        self.host_command(self._host_serial("wait-for-any-device"))
+
+    def connect_device(self, addr):
+        return self.host_query("host:connect:%s" % addr).decode("utf-8")
+
+    def disconnect_device(self, addr):
+        return self.host_query("host:disconnect:%s" % addr).decode("utf-8")
+
+    def features(self):
+        """
+        Returns:
+            set of the features supported by both the device and the adb server, e.g. `shell_v2`
+
+        """
+        if self._features is None:
+            out = self.host_query(self._host_serial("features")).decode("utf-8")
+            self._features = set(out.strip().split(","))
+        return self._features
+
+    def forward(self, local, remote, no_rebind=True):
+        self.host_command(self._host_serial("forward:%s%s;%s" % ("norebind:" if no_rebind else "", local, remote)))
+
+    def list_forward(self):
+        """
+        Returns:
+            forward list in the format of `adb forward --list`
+
+        """
+        return self.host_query(self._host_serial("list-forward")).decode("utf-8")
+
+    def remove_forward(self, local=None):
+        if local:
+            self.host_command(self._host_serial("killforward:%s" % local))
+        else:
+            self.host_command(self._host_serial("killforward-all"))
+
+    def shell(self, cmd):
+        """
+        Run the shell command, with shell protocol v2 if the device supports it
+
+        Args:
+            cmd: shell command
+
+        Returns:
+            stdout, stderr and exit code, stderr is mixed into stdout and exit code is None without shell protocol v2
+
+        """
+        if "shell_v2" in self.features():
+            return self._shell_v2(cmd)
+        return self.exec_out("shell:" + cmd), b"", None
+
+    def exec_out(self, service):
+        """
+        Run a device service and read the output until the service closes the socket
+
+        Args:
+            service: device service name, e.g. `exec:screencap`
+
+        Returns:
+            output (bytes)
+
+        """
+        s = self.open_service(service)
+        try:
+            chunks = []
+            while True:
+                chunk = s.sock.recv(self.SYNC_DATA_MAX)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            return b"".join(chunks)
+        finally:
+            s.close()
+
+    def _shell_v2(self, cmd):
+        s = self.open_service("shell,v2,raw:" + cmd)
+        try:
+            s.send(struct.pack("<BI", self.SHELL_ID_CLOSE_STDIN, 0))
+            stdout, stderr, exit_code = [], [], None
+            while exit_code is None:
+                try:
+                    packet_id, length = struct.unpack("<BI", s.recv(5))
+                except socket.error:
+                    # closed without exit code
+                    break
+                data = s.recv(length) if length else b""
+                if packet_id == self.SHELL_ID_STDOUT:
+                    stdout.append(data)
+                elif packet_id == self.SHELL_ID_STDERR:
+                    stderr.append(data)
+                elif packet_id == self.SHELL_ID_EXIT:
+                    exit_code = struct.unpack("<B", data[:1])[0]
+            return b"".join(stdout), b"".join(stderr), exit_code
+        finally:
+            s.close()
+
+    def push(self, local, remote):
+        """
+        Push the local file to the device by the sync service
+
+        Args:
+            local: local file
+            remote: remote file or directory
+
+        Returns:
+            None
+
+        """
+        s = self.open_service("sync:")
+        try:
+            mode, _, _ = self._sync_stat(s, remote)
+            if stat.S_ISDIR(mode):
+                remote = remote.rstrip("/") + "/" + os.path.basename(local)
+            st = os.stat(local)
+            self._sync_send(s, b"SEND", "%s,%d" % (remote, stat.S_IFMT(st.st_mode) | stat.S_IMODE(st.st_mode)))
+            with open(local, "rb") as f:
+                while True:
+                    data = f.read(self.SYNC_DATA_MAX)
+                    if not data:
+                        break
+                    s.send(b"DATA" + struct.pack("<I", len(data)) + data)
+            s.send(b"DONE" + struct.pack("<I", int(st.st_mtime)))
+            sync_id, length = struct.unpack("<4sI", s.recv(8))
+            if sync_id != b"OKAY":
+                raise AdbError("", self._decode(s.recv(length)))
+            self._sync_send(s, b"QUIT", "")
+        finally:
+            s.close()
+
+    def pull(self, remote, local):
+        """
+        Pull the remote file from the device by the sync service
+
+        Args:
+            remote: remote file
+            local: local file or directory
+
+        Returns:
+            None
+
+        """
+        if os.path.isdir(local):
+            local = os.path.join(local, remote.rstrip("/").split("/")[-1])
+        s = self.open_service("sync:")
+        try:
+            self._sync_send(s, b"RECV", remote)
+            with open(local, "wb") as f:
+                while True:
+                    sync_id, length = struct.unpack("<4sI", s.recv(8))
+                    if sync_id == b"DATA":
+                        f.write(s.recv_view(length))
+                    elif sync_id == b"DONE":
+                        break
+                    else:
+                        raise AdbError("", self._decode(s.recv(length)))
+            self._sync_send(s, b"QUIT", "")
+        except AdbError:
+            os.remove(local)
+            raise
+        finally:
+            s.close()
+
+    def _sync_stat(self, s, path):
+        self._sync_send(s, b"STAT", path)
+        sync_id, mode, size, mtime = struct.unpack("<4sIII", s.recv(16))
+        if sync_id != b"STAT":
+            raise AdbError("", "unexpected sync reply: %r" % sync_id)
+        return mode, size, mtime
+
+    @staticmethod
+    def _sync_send(s, sync_id, path):
+        s.send(encode_sync_request(sync_id, path))
+
+    def _read_status(self, s):
+        status = s.recv(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError("", self._decode(self._read_message(s)))
+        raise AdbError("", "unexpected adb server reply: %r" % status)
+
+    @staticmethod
+    def _read_message(s):
+        length = int(s.recv(4), 16)
+        return s.recv(length) if length else b""
+
+    @staticmethod
+    def _decode(data):
+        return data.decode("utf-8", "replace")
+
+
+class ShellSessionError(socket.error):
+    """the command is not written to the `ShellSession`, it can be run by a one-shot shell instead"""
+    pass
+
+
+class ShellSession(object):
+    """
+    Long-lived remote shell, the commands are written to its stdin one by one, the output of each command
+    is delimited by a sentinel line which also carries the exit code
+
+    Args:
+        client: `AdbClient` of the device
+        timeout: max seconds to wait for the sentinel of a command, default is `TIMEOUT`, None means forever
+
+    """
+
+    SENTINEL = "AIRTEST_SHELL_%s"
+    # shell protocol v2 packet id of stdin
+    SHELL_ID_STDIN = 0
+    TIMEOUT = 60
+
+    def __init__(self, client, timeout=TIMEOUT):
+        self.client = client
+        self.timeout = timeout
+        self.shell_v2 = "shell_v2" in client.features()
+        self.alive = True
+        self._deadline = None
+        self._buffers = {AdbClient.SHELL_ID_STDOUT: b"", AdbClient.SHELL_ID_STDERR: b""}
+        self._count = 0
+        if self.shell_v2:
+            self._sock = client.open_service("shell,v2,raw:")
+        else:
+            # the legacy shell runs in a pty, which echoes the input and prints prompts
+            self._sock = client.open_service("shell:")
+            self.run("stty -echo 2>/dev/null; PS1=''; PS2=''")
+
+    def run(self, cmd):
+        """
+        Run the shell command, the session is closed if any error occurs as the output may be out of sync
+
+        Args:
+            cmd: shell command
+
+        Raises:
+            ShellSessionError: if the quotes of the command are not closed, the command is not written
+            socket.timeout: if the sentinel is not read in time, the command may have been run
+            socket.error: if the shell exits or the connection is broken
+
+        Returns:
+            stdout, stderr and exit code, stderr is mixed into stdout without shell protocol v2
+
+        """
+        try:
+            shlex.split(cmd)
+        except ValueError as err:
+            # the shell would wait for the rest of the command forever
+            raise ShellSessionError("%s: %s" % (err, cmd))
+        self._count += 1
+        sentinel = self.SENTINEL % self._count
+        # quoted in two parts, so that the echoed input does not look like the sentinel
+        echo = 'echo "%s""%s' % (sentinel[:-1], sentinel[-1:])
+        # run in a subshell, so that `cd`, `export` or `exit` do not change the session, and stdin
+        # is not shared with the command, otherwise the following input may be read by it
+        script = "( %s\n) </dev/null; __airtest_rc=$?; %s $__airtest_rc\"" % (cmd, echo)
+        if self.shell_v2:
+            script += "; %s\" >&2" % echo
+        self._deadline = None if self.timeout is None else time.time() + self.timeout
+        try:
+            self._write((script + "\n").encode("utf-8"))
+            pattern = re.compile(re.escape(sentinel.encode("ascii")) + br" (\d+)\r*\n")
+            stdout, exit_code = self._read_until(AdbClient.SHELL_ID_STDOUT, pattern)
+            stderr = b""
+            if self.shell_v2:
+                pattern = re.compile(re.escape(sentinel.encode("ascii")) + br"\r*\n")
+                stderr, _ = self._read_until(AdbClient.SHELL_ID_STDERR, pattern)
+        except Exception:
+            self.close()
+            raise
+        return stdout, stderr, int(exit_code)
+
+    def close(self):
+        self.alive = False
+        self._sock.close()
+
+    def _write(self, data):
+        if self.shell_v2:
+            data = struct.pack("<BI", self.SHELL_ID_STDIN, len(data)) + data
+        self._sock.send(data)
+
+    def _read_until(self, packet_id, pattern):
+        while True:
+            m = pattern.search(self._buffers[packet_id])
+            if m:
+                buffer = self._buffers[packet_id]
+                self._buffers[packet_id] = buffer[m.end():]
+                return buffer[:m.start()], m.group(1) if m.groups() else None
+            self._read()
+
+    def _read(self):
+        if self._deadline is not None:
+            remaining = self._deadline - time.time()
+            if remaining <= 0:
+                raise socket.timeout("timed out")
+            self._sock.sock.settimeout(remaining)
+        if not self.shell_v2:
+            data = self._sock.sock.recv(AdbClient.SYNC_DATA_MAX)
+            if not data:
+                raise socket.error("shell exited")
+            self._buffers[AdbClient.SHELL_ID_STDOUT] += data
+            return
+        packet_id, length = struct.unpack("<BI", self._sock.recv(5))
+        data = self._sock.recv(length) if length else b""
+        if packet_id == AdbClient.SHELL_ID_EXIT:
+            raise socket.error("shell exited")
+        if packet_id in self._buffers:
+            self._buffers[packet_id] += data
+
+
+class ShellPool(object):
+    """
+    Pool of `ShellSession` of a device, a command is run in an idle session, or a new one when all the
+    sessions are busy and the pool is not full
+
+    Args:
+        client: `AdbClient` of the device
+        size: max number of sessions
+        timeout: timeout of the sessions, see `ShellSession`
+
+    """
+
+    def __init__(self, client, size=1, timeout=ShellSession.TIMEOUT):
+        self.client = client
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._count = 0
+        self._cond = threading.Condition()
+
+    def run(self, cmd):
+        """
+        Run the shell command in a session
+
+        Args:
+            cmd: shell command
+
+        Returns:
+            stdout, stderr and exit code, see `ShellSession.run`
+
+        """
+        session = self._acquire()
+        try:
+            return session.run(cmd)
+        finally:
+            self._release(session)
+
+    def close(self):
+        with self._cond:
+            for session in self._idle:
+                session.close()
+            self._count -= len(self._idle)
+            self._idle = []
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and self._count >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._count += 1
+        try:
+            return ShellSession(self.client, self.timeout)
+        except Exception as err:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            if isinstance(err, socket.error) and not isinstance(err, ShellSessionError):
+                # keep the errno, so that the adb server can be restarted by the caller
+                raise ShellSessionError(getattr(err, "errno", None), "can not open the shell session: %s" % err)
+            raise
+
+    def _release(self, session):
+        with self._cond:
+            if session.alive:
+                self._idle.append(session)
+            else:
+                self._count -= 1
+            self._cond.notify()
+
+
+def encode_request(service):
+    """encode the service request to the adb server: length in 4 hex digits followed by the service name"""
+    if isinstance(service, text_type):
+        service = service.encode("utf-8")
+    return ("%04x" % len(service)).encode("ascii") + service
+
+
+def encode_sync_request(sync_id, path):
+    """encode the request of the sync service: id, length of path (little endian) and path"""
+    data = path.encode("utf-8")
+    return sync_id + struct.pack("<I", len(data)) + data
+
+
+def is_server_down(err):
+    """
+    Check if the error is caused by the adb server not running
+
+    Args:
+        err: socket.error raised by `AdbClient`
+
+    Returns:
+        True or False
+
+    """
+    refused = [errno.ECONNREFUSED, getattr(errno, "WSAECONNREFUSED", errno.ECONNREFUSED)]
+    return getattr(err, "errno", None) in refused
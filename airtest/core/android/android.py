@@ -2,9 +2,12 @@
 # -*- coding: utf-8 -*-
 import re
 import time
+import struct
 import warnings
+import numpy as np
 from copy import copy
 from airtest import aircv
+from airtest.aircv import cv2
 from airtest.utils.logger import get_logger
 from airtest.core.device import Device
 from airtest.core.android.ime import YosemiteIme
@@ -17,6 +20,14 @@ from airtest.core.android.rotation import RotationWatcher, XYTransformer
 from airtest.core.android.recorder import Recorder
 
 LOGGING = get_logger(__name__)
+# pixel formats of the raw screencap output: (bytes per pixel, cv2 color conversion to BGR)
+RAW_PIXEL_FORMATS = {
+    1: (4, cv2.COLOR_RGBA2BGR),  # RGBA_8888
+    2: (4, cv2.COLOR_RGBA2BGR),  # RGBX_8888
+    3: (3, cv2.COLOR_RGB2BGR),  # RGB_888
+    4: (2, cv2.COLOR_BGR5652BGR),  # RGB_565
+    5: (4, cv2.COLOR_BGRA2BGR),  # BGRA_8888
+}
 
 
 class Android(Device):
@@ -27,10 +38,13 @@ class Android(Device):
                  touch_method=TOUCH_METHOD.MINITOUCH,
                  ime_method=IME_METHOD.YOSEMITEIME,
                  ori_method=ORI_METHOD.MINICAP,
+                 cap_scale=1.0,
                  ):
         super(Android, self).__init__()
         self.serialno = serialno or self.get_default_device()
         self.cap_method = cap_method.upper()
+        # minicap/javacap capture at this ratio of the display size, coordinates are scaled back on touch
+        self.cap_scale = float(cap_scale)
         self.touch_method = touch_method.upper()
         self.ime_method = ime_method.upper()
         self.ori_method = ori_method.upper()
@@ -42,8 +56,8 @@ class Android(Device):
         self._current_orientation = None
         # init components
         self.rotation_watcher = RotationWatcher(self.adb)
-        self.minicap = Minicap(self.adb, ori_function=self.get_display_info)
-        self.javacap = Javacap(self.adb)
+        self.minicap = Minicap(self.adb, ori_function=self.get_display_info, scale=self.cap_scale)
+        self.javacap = Javacap(self.adb, scale=self.cap_scale)
         self.minitouch = Minitouch(self.adb, ori_function=self.get_display_info)
         self.yosemite_ime = YosemiteIme(self.adb)
         self.recorder = Recorder(self.adb)
@@ -211,37 +225,86 @@ class Android(Device):
 
         """
         """default not write into file."""
+        frame = self.snapshot_frame(ensure_orientation=ensure_orientation)
+        if frame is None:
+            LOGGING.warning("No screenshot is taken")
+            return None
+        # output cv2 object
+        screen = frame.color()
+        if screen is None:
+            # may be black/locked screen or other reason
+            LOGGING.warning("Screenshot can not be decoded")
+            return None
+        if filename:
+            frame.save(filename)
+        return screen
+
+    def snapshot_frame(self, ensure_orientation=True):
+        """
+        Take the screenshot of the display without decoding it, it is decoded on demand as gray scale,
+        reduced or color image, see `aircv.LazyFrame`
+
+        Args:
+            ensure_orientation: True or False whether to keep the orientation same as display
+
+        Returns:
+            LazyFrame, or None if no screenshot is taken
+
+        """
         if self.cap_method == CAP_METHOD.MINICAP_STREAM:
             self.rotation_watcher.get_ready()
-            screen = self.minicap.get_frame_from_stream()
+            data = self.minicap.get_frame_from_stream()
         elif self.cap_method == CAP_METHOD.MINICAP:
-            screen = self.minicap.get_frame()
+            data = self.minicap.get_frame()
         elif self.cap_method == CAP_METHOD.JAVACAP:
-            screen = self.javacap.get_frame_from_stream()
+            data = self.javacap.get_frame_from_stream()
+        elif self.cap_method == CAP_METHOD.ADBCAP_RAW:
+            data = self.adb.raw_snapshot()
         else:
-            screen = self.adb.snapshot()
-        # output cv2 object
-        try:
-            screen = aircv.utils.string_2_img(screen)
-        except Exception:
-            # may be black/locked screen or other reason, print exc for debugging
-            import traceback
-            traceback.print_exc()
+            data = self.adb.snapshot()
+        if data is None:
             return None
+        if isinstance(data, memoryview):
+            # stream frames are views of the socket buffer, the frame may be kept longer than that
+            data = data.tobytes()
 
         # ensure the orientation is right
+        rotation = 0
         if ensure_orientation and self.display_info["orientation"]:
             # minicap screenshots are different for various sdk_version
             if self.cap_method in (CAP_METHOD.MINICAP, CAP_METHOD.MINICAP_STREAM) and self.sdk_version <= 16:
-                h, w = screen.shape[:2]  # cvshape是高度在前面!!!!
+                w, h = aircv.LazyFrame(data).resolution or (0, 0)
                 if w < h:  # 当前是横屏，但是图片是竖的，则旋转，针对sdk<=16的机器
-                    screen = aircv.rotate(screen, self.display_info["orientation"] * 90, clockwise=False)
+                    rotation = self.display_info["orientation"] * 90
             # adb 截图总是要根据orientation旋转
-            elif self.cap_method == CAP_METHOD.ADBCAP:
-                screen = aircv.rotate(screen, self.display_info["orientation"] * 90, clockwise=False)
-        if filename:
-            aircv.imwrite(filename, screen)
-        return screen
+            elif self.cap_method in (CAP_METHOD.ADBCAP, CAP_METHOD.ADBCAP_RAW):
+                rotation = self.display_info["orientation"] * 90
+        if self.cap_method == CAP_METHOD.ADBCAP_RAW:
+            try:
+                return aircv.LazyFrame(image=raw_screencap_2_img(data), rotation=rotation)
+            except Exception:
+                import traceback
+                traceback.print_exc()
+                return None
+        return aircv.LazyFrame(data, rotation=rotation)
+
+    def wait_new_frame(self, timeout=None):
+        """
+        Wait until a new frame can be taken by `snapshot`, used by frame driven `loop_find`
+
+        Args:
+            timeout: max time to wait in seconds
+
+        Returns:
+            True if the capture method is a stream which delivers the latest frame on each snapshot,
+            False if the caller has to wait by itself
+
+        """
+        if self.cap_method == CAP_METHOD.MINICAP_STREAM and self.minicap.background:
+            # block until the background stream has a frame newer than the last snapshot
+            self.minicap.wait_new_frame(timeout=timeout)
+            return True
+        return self.cap_method in (CAP_METHOD.MINICAP_STREAM, CAP_METHOD.JAVACAP)
 
     def shell(self, *args, **kwargs):
         """
@@ -325,6 +388,7 @@ class Android(Device):
             None
 
         """
+        pos = self._scale_to_display(pos)
         if self.touch_method == TOUCH_METHOD.MINITOUCH:
             pos = self._touch_point_by_orientation(pos)
             self.minitouch.touch(pos, duration=duration)
@@ -351,6 +415,7 @@ class Android(Device):
             None
 
         """
+        p1, p2 = self._scale_to_display(p1), self._scale_to_display(p2)
         if self.touch_method == TOUCH_METHOD.MINITOUCH:
             p1 = self._touch_point_by_orientation(p1)
             p2 = self._touch_point_by_orientation(p2)
@@ -364,19 +429,24 @@ class Android(Device):
             duration *= 1000  # adb的swipe操作时间是以毫秒为单位的。
             self.adb.swipe(p1, p2, duration=duration)
 
-    def pinch(self, *args, **kwargs):
+    def pinch(self, center=None, percent=0.5, duration=0.5, steps=5, in_or_out='in'):
         """
         Perform pinch event on the device
 
         Args:
-            *args: optional arguments
-            **kwargs: optional arguments
+            center: the center point of the pinch operation, default is the center of the screen
+            percent: pinch distance to half of screen, default is 0.5
+            duration: how long to pinch the screen, default 0.5
+            steps: how big is the pinch step, default 5
+            in_or_out: pinch in or pinch out, default is 'in'
 
         Returns:
             None
 
         """
-        return self.minitouch.pinch(*args, **kwargs)
+        if center is not None:
+            center = self._scale_to_display(center)
+        return self.minitouch.pinch(center, percent=percent, duration=duration, steps=steps, in_or_out=in_or_out)
 
     def logcat(self, *args, **kwargs):
         """
@@ -550,8 +620,42 @@ class Android(Device):
         w, h = self.display_info["width"], self.display_info["height"]
         if self.display_info["orientation"] in [1, 3]:
             w, h = h, w
+        scale = self.screen_scale
+        if scale != 1:
+            # the virtual resolution of the reduced screenshots
+            w, h = int(round(w * scale)), int(round(h * scale))
         return w, h
 
+    @property
+    def screen_scale(self):
+        """
+        Ratio of the screenshot size to the display size, coordinates on the screenshots are mapped to the display
+        by this ratio, it is `cap_scale` for the capture methods which capture at reduced resolution on the device
+
+        Returns:
+            ratio of the screenshot size
+
+        """
+        if self.cap_method in (CAP_METHOD.MINICAP, CAP_METHOD.MINICAP_STREAM, CAP_METHOD.JAVACAP):
+            return self.cap_scale
+        return 1.0
+
+    def _scale_to_display(self, pos):
+        """
+        Convert screenshot coordinates to the display coordinates of the same orientation
+
+        Args:
+            pos: coordinates (x, y) on the screenshot
+
+        Returns:
+            coordinates (x, y) on the display
+
+        """
+        scale = self.screen_scale
+        if scale == 1:
+            return pos
+        return pos[0] / scale, pos[1] / scale
+
     def start_recording(self, *args, **kwargs):
         """
         Start recording the device display
@@ -611,3 +715,27 @@ class Android(Device):
             self.display_info["orientation"]
         )
         return x, y
+
+
+def raw_screencap_2_img(raw):
+    """
+    Convert the raw screencap output into a BGR image, the pixels are viewed by numpy without copy
+    and converted by cv2 at once
+
+    Args:
+        raw: output of `ADB.raw_snapshot`
+
+    Returns:
+        screen image
+
+    """
+    width, height, pixel_format = struct.unpack("<3I", raw[:12])
+    if pixel_format not in RAW_PIXEL_FORMATS:
+        raise ValueError("unsupported screencap pixel format: %s" % pixel_format)
+    bpp, color_conversion = RAW_PIXEL_FORMATS[pixel_format]
+    # the header is 12 bytes, or 16 bytes with the color space since Android 9
+    header_size = len(raw) - width * height * bpp
+    if header_size not in (12, 16):
+        raise ValueError("unexpected screencap output size: %s for %sx%s" % (len(raw), width, height))
+    pixels = np.frombuffer(raw, np.uint8, offset=header_size).reshape(height, width, bpp)
+    return cv2.cvtColor(pixels, color_conversion)
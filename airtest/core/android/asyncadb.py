@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio version of `ADB`, requires Python 3.6+
+
+Examples:
+    async def setup(serialno):
+        adb = AsyncADB(serialno)
+        await adb.install_app("app.apk", replace=True)
+        return await adb.shell("getprop ro.build.version.sdk")
+
+    loop.run_until_complete(asyncio.gather(*[setup(serialno) for serialno, _ in ADB().devices("device")]))
+"""
+import asyncio
+import os
+import re
+import stat
+import struct
+import sys
+
+from airtest.core.android.adb import ADB
+from airtest.core.android.adbclient import AdbClient, encode_request, encode_sync_request
+from airtest.core.error import AdbError, AdbShellError, DeviceConnectionError
+from airtest.utils.compat import decode_path
+from airtest.utils.snippet import get_std_encoding, split_cmd
+
+
+class AsyncADB(object):
+    """
+    adb client running on asyncio, the commands are coroutines which talk to the adb server by the host protocol
+    over asyncio streams, only `install_app` starts an adb process
+
+    Args:
+        serialno: serial number of the device
+        adb_path: adb executable path for `install_app`, default is the built-in adb
+        server_addr: adb server address, default is 127.0.0.1:5037
+
+    """
+
+    SHELL_ENCODING = ADB.SHELL_ENCODING
+
+    def __init__(self, serialno=None, adb_path=None, server_addr=None):
+        self.serialno = serialno
+        self.adb_path = adb_path or ADB.builtin_adb_path()
+        self.host = server_addr[0] if server_addr else "127.0.0.1"
+        self.port = int(server_addr[1]) if server_addr else 5037
+        self._features = None
+
+    async def devices(self, state=None):
+        """
+        Get the list of adb devices
+
+        Args:
+            state: optional parameter to filter devices in specific state
+
+        Returns:
+            list of (serialno, state)
+
+        """
+        output = (await self._host_query("host:devices")).decode("utf-8")
+        return ADB._parse_devices(output, state)
+
+    async def shell(self, cmd):
+        """
+        Run the shell command on the device
+
+        Args:
+            cmd: a command to be run
+
+        Raises:
+            AdbShellError: if command return value is non-zero
+
+        Returns:
+            command output
+
+        """
+        cmd = " ".join(split_cmd(cmd))
+        if "shell_v2" in await self.features():
+            stdout, stderr, returncode = await self._shell_v2(cmd)
+            stdout, stderr = self._decode(stdout), self._decode(stderr)
+            if returncode:
+                raise AdbShellError(stdout, stderr)
+            return stdout
+        # legacy shell do not return the exit code
+        out = await self._exec_out("shell:" + cmd + " ; echo ---$?---")
+        stdout, returncode = ADB._split_returncode(self._decode(out))
+        if returncode > 0:
+            raise AdbShellError("", stdout)
+        return stdout
+
+    async def features(self):
+        """
+        Returns:
+            set of the features supported by both the device and the adb server
+
+        """
+        if self._features is None:
+            out = await self._host_query(self._host_serial("features"))
+            self._features = set(out.decode("utf-8").strip().split(","))
+        return self._features
+
+    async def push(self, local, remote):
+        """
+        Push the local file to the device
+
+        Args:
+            local: local file
+            remote: remote file or directory
+
+        Returns:
+            None
+
+        """
+        reader, writer = await self._open_service("sync:")
+        try:
+            writer.write(encode_sync_request(b"STAT", remote))
+            sync_id, mode, _, _ = struct.unpack("<4sIII", await reader.readexactly(16))
+            if sync_id != b"STAT":
+                raise AdbError("", "unexpected sync reply: %r" % sync_id)
+            if stat.S_ISDIR(mode):
+                remote = remote.rstrip("/") + "/" + os.path.basename(local)
+            st = os.stat(local)
+            writer.write(encode_sync_request(b"SEND", "%s,%d" % (remote, st.st_mode)))
+            with open(local, "rb") as f:
+                while True:
+                    data = f.read(AdbClient.SYNC_DATA_MAX)
+                    if not data:
+                        break
+                    writer.write(b"DATA" + struct.pack("<I", len(data)) + data)
+                    # backpressure of the socket
+                    await writer.drain()
+            writer.write(b"DONE" + struct.pack("<I", int(st.st_mtime)))
+            await self._read_sync_status(reader)
+            writer.write(encode_sync_request(b"QUIT", ""))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def pull(self, remote, local):
+        """
+        Pull the remote file from the device
+
+        Args:
+            remote: remote file
+            local: local file or directory
+
+        Returns:
+            None
+
+        """
+        if os.path.isdir(local):
+            local = os.path.join(local, remote.rstrip("/").split("/")[-1])
+        reader, writer = await self._open_service("sync:")
+        try:
+            writer.write(encode_sync_request(b"RECV", remote))
+            with open(local, "wb") as f:
+                while True:
+                    sync_id, length = struct.unpack("<4sI", await reader.readexactly(8))
+                    if sync_id == b"DATA":
+                        f.write(await reader.readexactly(length))
+                    elif sync_id == b"DONE":
+                        break
+                    elif sync_id == b"FAIL":
+                        raise AdbError("", self._decode(await reader.readexactly(length)))
+                    else:
+                        raise AdbError("", "unexpected sync reply: %r" % sync_id)
+            writer.write(encode_sync_request(b"QUIT", ""))
+            await writer.drain()
+        except AdbError:
+            os.remove(local)
+            raise
+        finally:
+            writer.close()
+
+    async def forward(self, local, remote, no_rebind=True):
+        """
+        Forward the local port to the device
+
+        Args:
+            local: local tcp port, e.g. "tcp:11111"
+            remote: device port, e.g. "localabstract:minicap"
+            no_rebind: True or False
+
+        Returns:
+            None
+
+        """
+        service = "forward:%s%s;%s" % ("norebind:" if no_rebind else "", local, remote)
+        reader, writer = await self._request(self._host_serial(service))
+        try:
+            await self._read_status(reader)
+        finally:
+            writer.close()
+
+    async def get_forwards(self):
+        """
+        Returns:
+            list of (serialno, local, remote)
+
+        """
+        output = await self._host_query(self._host_serial("list-forward"))
+        return ADB._parse_forwards(output.decode("utf-8"))
+
+    async def logcat(self, grep_str="", extra_args=""):
+        """
+        Read the logcat output line by line
+
+        Args:
+            grep_str: pattern to filter from the logcat output
+            extra_args: additional logcat arguments
+
+        Yields:
+            logcat lines (bytes)
+
+        """
+        cmds = "logcat"
+        if extra_args:
+            cmds += " " + extra_args
+        if grep_str:
+            cmds += " | grep " + grep_str
+        reader, writer = await self._open_service("shell:" + cmds)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                yield line
+        finally:
+            writer.close()
+
+    async def install_app(self, filepath, replace=False):
+        """
+        Perform `adb install` command in a subprocess
+
+        Args:
+            filepath: full path to file to be installed on the device
+            replace: force to replace existing application, default is False
+
+        Raises:
+            AirtestError: if installation fails
+            AdbError: if adb exits with error
+
+        Returns:
+            command output
+
+        """
+        filepath = decode_path(filepath)
+        if not os.path.isfile(filepath):
+            raise RuntimeError("file: %s does not exists" % (repr(filepath)))
+        cmds = ["install", "-r", filepath] if replace else ["install", filepath]
+        out = await self.cmd(cmds)
+        ADB._check_install_output(out)
+        return out
+
+    async def cmd(self, cmds, device=True):
+        """
+        Run the adb command(s) in a subprocess and return the standard output
+
+        Args:
+            cmds: command(s) to be run
+            device: if True, the device serial number must be specified by -s serialno argument
+
+        Raises:
+            DeviceConnectionError: if any error occurs when connecting the device
+            AdbError: if any other adb error occurs
+
+        Returns:
+            command(s) standard output (stdout)
+
+        """
+        cmd_options = [self.adb_path, "-H", self.host, "-P", str(self.port)]
+        if device:
+            if not self.serialno:
+                raise RuntimeError("please set serialno first")
+            cmd_options += ["-s", self.serialno]
+        proc = await asyncio.create_subprocess_exec(*(cmd_options + split_cmd(cmds)),
+                                                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        stdout, stderr = await proc.communicate()
+        stdout = stdout.decode(get_std_encoding(sys.stdout))
+        stderr = stderr.decode(get_std_encoding(sys.stderr))
+        if proc.returncode > 0:
+            if re.search(DeviceConnectionError.DEVICE_CONNECTION_ERROR, stderr):
+                raise DeviceConnectionError(stderr)
+            raise AdbError(stdout, stderr)
+        return stdout
+
+    def _host_serial(self, service):
+        return "host-serial:%s:%s" % (self.serialno, service)
+
+    def _decode(self, data):
+        try:
+            return data.decode(self.SHELL_ENCODING)
+        except UnicodeDecodeError:
+            return repr(data)
+
+    async def _request(self, service):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(encode_request(service))
+            await self._read_status(reader)
+        except Exception:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def _read_status(self, reader):
+        status = await reader.readexactly(4)
+        if status == b"FAIL":
+            raise AdbError("", self._decode(await self._read_message(reader)))
+        if status != b"OKAY":
+            raise AdbError("", "unexpected adb server reply: %r" % status)
+
+    async def _read_sync_status(self, reader):
+        sync_id, length = struct.unpack("<4sI", await reader.readexactly(8))
+        if sync_id == b"FAIL":
+            raise AdbError("", self._decode(await reader.readexactly(length)))
+        if sync_id != b"OKAY":
+            raise AdbError("", "unexpected sync reply: %r" % sync_id)
+
+    @staticmethod
+    async def _read_message(reader):
+        length = int(await reader.readexactly(4), 16)
+        return await reader.readexactly(length)
+
+    async def _host_query(self, service):
+        reader, writer = await self._request(service)
+        try:
+            return await self._read_message(reader)
+        finally:
+            writer.close()
+
+    async def _open_service(self, service):
+        if not self.serialno:
+            raise RuntimeError("please set serialno first")
+        reader, writer = await self._request("host:transport:%s" % self.serialno)
+        try:
+            writer.write(encode_request(service))
+            await self._read_status(reader)
+        except Exception:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def _exec_out(self, service):
+        reader, writer = await self._open_service(service)
+        try:
+            return await reader.read()
+        finally:
+            writer.close()
+
+    async def _shell_v2(self, cmd):
+        reader, writer = await self._open_service("shell,v2,raw:" + cmd)
+        try:
+            writer.write(struct.pack("<BI", AdbClient.SHELL_ID_CLOSE_STDIN, 0))
+            stdout, stderr, returncode = [], [], None
+            while returncode is None:
+                try:
+                    packet_id, length = struct.unpack("<BI", await reader.readexactly(5))
+                except asyncio.IncompleteReadError:
+                    break
+                data = await reader.readexactly(length)
+                if packet_id == AdbClient.SHELL_ID_STDOUT:
+                    stdout.append(data)
+                elif packet_id == AdbClient.SHELL_ID_STDERR:
+                    stderr.append(data)
+                elif packet_id == AdbClient.SHELL_ID_EXIT:
+                    returncode = data[0]
+            return b"".join(stdout), b"".join(stderr), returncode
+        finally:
+            writer.close()
@@ -29,6 +29,7 @@ class CAP_METHOD(object):
     MINICAP = "MINICAP"
     MINICAP_STREAM = "MINICAP_STREAM"
     ADBCAP = "ADBCAP"
+    ADBCAP_RAW = "ADBCAP_RAW"
     JAVACAP = "JAVACAP"
 
 
@@ -17,9 +17,14 @@ class Javacap(Yosemite):
     SCREENCAP_SERVICE = "com.netease.nie.yosemite.Capture"
     RECVTIMEOUT = None
 
-    def __init__(self, adb):
+    def __init__(self, adb, scale=1.0):
+        """
+        :param adb: adb instance of android device
+        :param scale: capture at this ratio of the display size, default is 1.0
+        """
         super(Javacap, self).__init__(adb)
         self.frame_gen = None
+        self.scale = scale
 
     @on_method_ready('install_or_upgrade')
     def _setup_stream_server(self):
@@ -35,7 +40,7 @@ class Javacap(Yosemite):
         # setup agent proc
         apkpath = self.adb.path_app(self.APP_PKG)
         cmds = ["CLASSPATH=" + apkpath, 'exec', 'app_process', '/system/bin', self.SCREENCAP_SERVICE,
-                "--scale", "100", "--socket", "%s" % deviceport, "-lazy", "2>&1"]
+                "--scale", "%d" % round(self.scale * 100), "--socket", "%s" % deviceport, "-lazy", "2>&1"]
         proc = self.adb.start_shell(cmds)
         # check proc output
         nbsp = NonBlockingStreamReader(proc.stdout, print_output=True, name="javacap_sever")
@@ -79,7 +84,8 @@ class Javacap(Yosemite):
                 stopping = yield None
             else:
                 frame_size = struct.unpack("<I", header)[0]
-                frame_data = s.recv(frame_size)
+                # the frame is a view of the socket buffer, it is overwritten by the next frame
+                frame_data = s.recv_view(frame_size)
                 stopping = yield frame_data
 
         LOGGING.debug("javacap stream ends")
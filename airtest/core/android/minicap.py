@@ -4,6 +4,7 @@ import re
 import json
 import struct
 import threading
+import time
 import six
 import socket
 from functools import wraps
@@ -11,7 +12,7 @@ from airtest.core.android.constant import STFLIB, ORI_METHOD
 from airtest.utils.logger import get_logger
 from airtest.utils.nbsp import NonBlockingStreamReader
 from airtest.utils.safesocket import SafeSocket
-from airtest.utils.snippet import reg_cleanup, on_method_ready, ready_method
+from airtest.utils.snippet import reg_cleanup, on_method_ready, ready_method, is_exiting
 
 
 LOGGING = get_logger(__name__)
@@ -37,20 +38,37 @@ class Minicap(object):
     VERSION = 5
     RECVTIMEOUT = None
     CMD = "LD_LIBRARY_PATH=/data/local/tmp /data/local/tmp/minicap"
-
-    def __init__(self, adb, projection=None, ori_function=None):
+    # read the stream in non-lazy mode by a background thread, `get_frame_from_stream` returns the latest frame at once
+    BACKGROUND = False
+    # max time to wait for the first frame of the background stream
+    FIRST_FRAME_TIMEOUT = 10
+    # max time to wait for the background thread to exit on teardown
+    GRABBER_JOIN_TIMEOUT = 5
+
+    def __init__(self, adb, projection=None, ori_function=None, background=None, scale=1.0):
         """
         :param adb: adb instance of android device
         :param projection: projection, default is None. If `None`, physical display size is used
+        :param background: read frames by a background thread, default is None which means using `BACKGROUND`
+        :param scale: project the physical display size by this ratio when `projection` is None, default is 1.0
         """
         self.adb = adb
         self.projection = projection
+        self.scale = scale
         self.ori_function = ori_function if callable(ori_function) else self.get_display_info
         self.frame_gen = None
         self.stream_lock = threading.Lock()
         self.quirk_flag = 0
         self._stream_rotation = None
         self._update_rotation_event = threading.Event()
+        self.background = self.BACKGROUND if background is None else background
+        # latest frame read by the background thread: (sequence number, timestamp, jpg data)
+        self._frame = None
+        self._frame_cond = threading.Condition()
+        self._consumed_seq = 0
+        self._grabber = None
+        self._grabber_stop = None
+        self._stream_sock = None
 
     @ready_method
     def install_or_upgrade(self):
@@ -191,7 +209,8 @@ class Minicap(object):
         if projection:
             proj_width, proj_height = projection
         else:
-            proj_width, proj_height = real_width, real_height
+            # 设备端缩小截图, 减少编码和传输的数据量
+            proj_width, proj_height = int(round(real_width * self.scale)), int(round(real_height * self.scale))
 
         if self.quirk_flag & 2 and real_rotation in (90, 270):
             params = real_height, real_width, proj_height, proj_width, 0
@@ -233,44 +252,48 @@ class Minicap(object):
         proc, nbsp, localport = self._setup_stream_server(lazy=lazy)
         s = SafeSocket()
         s.connect((self.adb.host, localport))
-        t = s.recv(24)
-        # minicap header
-        global_headers = struct.unpack("<2B5I2B", t)
-        LOGGING.debug(global_headers)
-        # check quirk-bitflags, reference: https://github.com/openstf/minicap#quirk-bitflags
-        ori, self.quirk_flag = global_headers[-2:]
-
-        if self.quirk_flag & 2 and ori in (1, 3):
-            # resetup
-            LOGGING.debug("quirk_flag found, going to resetup")
-            stopping = True
-        else:
-            stopping = False
-        yield stopping
-
-        while not stopping:
-            if lazy:
-                s.send(b"1")
-            # recv frame header, count frame_size
-            if self.RECVTIMEOUT is not None:
-                header = s.recv_with_timeout(4, self.RECVTIMEOUT)
-            else:
-                header = s.recv(4)
-            if header is None:
-                LOGGING.error("minicap header is None")
-                # recv timeout, if not frame updated, maybe screen locked
-                stopping = yield None
+        # the grabber thread blocked in recv is woken up by shutting down the socket, see `teardown_stream`
+        self._stream_sock = s
+        try:
+            t = s.recv(24)
+            # minicap header
+            global_headers = struct.unpack("<2B5I2B", t)
+            LOGGING.debug(global_headers)
+            # check quirk-bitflags, reference: https://github.com/openstf/minicap#quirk-bitflags
+            ori, self.quirk_flag = global_headers[-2:]
+
+            if self.quirk_flag & 2 and ori in (1, 3):
+                # resetup
+                LOGGING.debug("quirk_flag found, going to resetup")
+                stopping = True
             else:
-                frame_size = struct.unpack("<I", header)[0]
-                frame_data = s.recv(frame_size)
-                stopping = yield frame_data
-
-        LOGGING.debug("minicap stream ends")
-        s.close()
-        nbsp.kill()
-        proc.kill()
-        self.adb.remove_forward("tcp:%s" % localport)
-        self.adb.close_proc_pipe(proc)
+                stopping = False
+            yield stopping
+
+            while not stopping:
+                if lazy:
+                    s.send(b"1")
+                # recv frame header, count frame_size
+                if self.RECVTIMEOUT is not None:
+                    header = s.recv_with_timeout(4, self.RECVTIMEOUT)
+                else:
+                    header = s.recv(4)
+                if header is None:
+                    LOGGING.error("minicap header is None")
+                    # recv timeout, if not frame updated, maybe screen locked
+                    stopping = yield None
+                else:
+                    frame_size = struct.unpack("<I", header)[0]
+                    # the frame is a view of the socket buffer, it is overwritten by the next frame
+                    frame_data = s.recv_view(frame_size)
+                    stopping = yield frame_data
+        finally:
+            LOGGING.debug("minicap stream ends")
+            s.close()
+            nbsp.kill()
+            proc.kill()
+            self.adb.remove_forward("tcp:%s" % localport)
+            self.adb.close_proc_pipe(proc)
 
     def _setup_stream_server(self, lazy=False):
         """
@@ -308,15 +331,24 @@ class Minicap(object):
         self._stream_rotation = int(display_info["rotation"])
         return proc, nbsp, localport
 
-    @retry_when_socket_error
     def get_frame_from_stream(self):
         """
-        Get one frame from minicap stream
+        Get one frame from minicap stream, in background mode the latest frame is returned without waiting
 
         Returns:
-            frame
+            jpg data, a memoryview only valid until the next frame is read (bytes in background mode)
 
         """
+        if self.background:
+            frame = self.wait_for_frame(timeout=self.FIRST_FRAME_TIMEOUT)
+            if frame is None:
+                return None
+            self._consumed_seq = max(self._consumed_seq, frame[0])
+            return frame[2]
+        return self._get_frame_from_stream()
+
+    @retry_when_socket_error
+    def _get_frame_from_stream(self):
         if self._update_rotation_event.is_set():
             LOGGING.debug("do update rotation")
             self.teardown_stream()
@@ -325,6 +357,90 @@ class Minicap(object):
             self.frame_gen = self.get_stream()
         return six.next(self.frame_gen)
 
+    def wait_for_frame(self, newer_than=0, timeout=None):
+        """
+        Wait for a frame read by the background thread, the thread is started on first call
+
+        Args:
+            newer_than: sequence number, only frames after it are returned
+            timeout: max time to wait in seconds, None means waiting forever
+
+        Returns:
+            (sequence number, timestamp, jpg data) of the latest frame, or None if timeout
+
+        """
+        self._start_grabber()
+        deadline = None if timeout is None else time.time() + timeout
+        with self._frame_cond:
+            while self._frame is None or self._frame[0] <= newer_than:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                # wake up periodically, Condition.wait without timeout can not be interrupted in python2
+                self._frame_cond.wait(1.0 if remaining is None else min(remaining, 1.0))
+            return self._frame
+
+    def wait_new_frame(self, timeout=None):
+        """
+        Wait for a frame newer than the one returned by the last `get_frame_from_stream`
+
+        Args:
+            timeout: max time to wait in seconds
+
+        Returns:
+            True if a new frame arrived, otherwise False
+
+        """
+        return self.wait_for_frame(newer_than=self._consumed_seq, timeout=timeout) is not None
+
+    def _start_grabber(self):
+        with self.stream_lock:
+            if self._grabber is not None and self._grabber.is_alive():
+                return
+            self._grabber_stop = threading.Event()
+            self._grabber = threading.Thread(target=self._grab_frames, args=(self._grabber_stop,), name="minicap_grabber")
+            self._grabber.daemon = True
+            self._grabber.start()
+
+    def _grab_frames(self, stop_event):
+        """Read frames from a non-lazy stream into the latest frame slot until `stop_event` is set."""
+        gen = None
+        while not stop_event.is_set() and not is_exiting():
+            try:
+                if self._update_rotation_event.is_set():
+                    LOGGING.debug("do update rotation")
+                    self._update_rotation_event.clear()
+                    self._close_stream(gen)
+                    gen = None
+                if gen is None:
+                    gen = self.get_stream(lazy=False)
+                frame_data = six.next(gen)
+            except (socket.error, StopIteration, RuntimeError) as err:
+                LOGGING.error("minicap background stream error: %s" % repr(err))
+                self._close_stream(gen)
+                gen = None
+                stop_event.wait(1.0)
+                continue
+            if frame_data is None:
+                continue
+            # keep a copy, the view is overwritten by the next frame
+            frame_data = frame_data.tobytes()
+            with self._frame_cond:
+                seq = self._frame[0] + 1 if self._frame else 1
+                self._frame = (seq, time.time(), frame_data)
+                self._frame_cond.notify_all()
+        self._close_stream(gen)
+
+    @staticmethod
+    def _close_stream(gen):
+        if gen is None:
+            return
+        try:
+            gen.send(1)
+        except Exception:
+            # stream already ended, or just started
+            pass
+
     def update_rotation(self, rotation):
         """
         Update rotation and reset the backend stream generator
@@ -347,6 +463,24 @@ class Minicap(object):
             None
 
         """
+        if self._grabber_stop is not None:
+            self._grabber_stop.set()
+            # the stream socket is closed by the grabber when it exits
+            sock, self._stream_sock = self._stream_sock, None
+            if sock is not None:
+                try:
+                    sock.sock.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
+            if self._grabber is not None and self._grabber is not threading.current_thread():
+                self._grabber.join(self.GRABBER_JOIN_TIMEOUT)
+                if self._grabber.is_alive():
+                    LOGGING.warn("minicap grabber does not exit in %ss" % self.GRABBER_JOIN_TIMEOUT)
+            self._grabber = None
+            self._grabber_stop = None
+            with self._frame_cond:
+                self._frame = None
+                self._consumed_seq = 0
         if not self.frame_gen:
             return
         try:
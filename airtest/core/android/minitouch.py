@@ -74,7 +74,7 @@ class Minitouch(object):
         """
 
         abi = self.adb.getprop("ro.product.cpu.abi")
-        sdk = int(self.adb.getprop("ro.build.version.sdk"))
+        sdk = self.adb.sdk_version
 
         if sdk >= 16:
             binfile = "minitouch"
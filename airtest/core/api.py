@@ -7,7 +7,7 @@ import time
 
 from six.moves.urllib.parse import parse_qsl, urlparse
 
-from airtest.core.cv import Template, loop_find, try_log_screen
+from airtest.core.cv import Template, loop_find, loop_find_any, match_many, try_log_screen
 from airtest.core.error import TargetNotFoundError
 from airtest.core.helper import (G, delay_after_operation, import_device_cls,
                                  logwrap, set_logdir, using, log)
@@ -412,6 +412,55 @@ def exists(v):
         return pos
 
 
+@logwrap
+def wait_any(vs, timeout=None, interval=0.5, intervalfunc=None):
+    """
+    Wait to match any of the Templates on the device screen, all Templates are matched against the same screenshot
+
+    :param vs: list of Template instances in priority order
+    :param timeout: time interval to wait for the match, default is None which is ``ST.FIND_TIMEOUT``
+    :param interval: time interval in seconds to attempt to find a match
+    :param intervalfunc: called after each unsuccessful attempt to find the corresponding match
+    :raise TargetNotFoundError: raised if none of the targets is found after the time limit expired
+    :return: the first matched Template in the order of `vs` and its coordinates, (v, (x, y))
+    :platforms: Android, Windows, iOS
+    """
+    timeout = timeout or ST.FIND_TIMEOUT
+    return loop_find_any(vs, timeout=timeout, interval=interval, intervalfunc=intervalfunc)
+
+
+@logwrap
+def exists_any(vs):
+    """
+    Check whether any of the given targets exists on device screen
+
+    :param vs: list of targets to be checked in priority order
+    :return: False if none of the targets is found, otherwise returns the first found target and its coordinates,
+             (v, (x, y))
+    :platforms: Android, Windows, iOS
+    """
+    try:
+        return loop_find_any(vs, timeout=ST.FIND_TIMEOUT_TMP)
+    except TargetNotFoundError:
+        return False
+
+
+@logwrap
+def find_many(vs):
+    """
+    Take one screenshot and match all the targets against it
+
+    :param vs: list of targets to find
+    :return: list of every target found with its coordinates and confidence, in the order of `vs`,
+             [(v, (x, y), confidence), ...]
+    :platforms: Android, Windows, iOS
+    """
+    screen = G.DEVICE.snapshot()
+    if screen is None:
+        return []
+    return match_many(vs, screen)
+
+
 @logwrap
 def find_all(v):
     """
@@ -3,17 +3,39 @@
 
 """"Airtest图像识别专用."""
 import os
+import functools
 import sys
 import time
 import types
+import threading
+from multiprocessing.pool import ThreadPool
 from airtest import aircv
 from airtest.aircv import cv2
 from airtest.core.error import TargetNotFoundError
 from airtest.core.helper import G, logwrap
 from airtest.core.settings import Settings as ST
+from airtest.utils.lru import LRUCache
 from airtest.utils.transform import TargetPos
+from contextlib import contextmanager
 from copy import deepcopy
 from six import PY3
+from six.moves import queue
+
+
+# process-wide cache of decoded/resized template images, see Template._get_images
+TEMPLATE_CACHE = LRUCache(ST.TEMPLATE_CACHE_SIZE, getsizeof=lambda images: sum(img.nbytes for img in images))
+# thread pool shared by all the templates when ST.CVSTRATEGY_CONCURRENT is on, see _get_strategy_pool
+_STRATEGY_POOL = None
+_STRATEGY_POOL_LOCK = threading.Lock()
+
+
+def _get_strategy_pool():
+    """Get the thread pool for running cv strategies concurrently, created on first use."""
+    global _STRATEGY_POOL
+    with _STRATEGY_POOL_LOCK:
+        if _STRATEGY_POOL is None:
+            _STRATEGY_POOL = ThreadPool()
+        return _STRATEGY_POOL
 
 
 @logwrap
@@ -38,15 +60,22 @@ def loop_find(query, timeout=ST.FIND_TIMEOUT, threshold=None, interval=0.5, inte
     """
     G.LOGGING.info("Try finding:\n%s", query)
     start_time = time.time()
+    change_detector = FrameChangeDetector()
+    pacer = FramePacer(interval)
     while True:
-        screen = G.DEVICE.snapshot(filename=None)
+        pacer.start()
+        screen = _snapshot()
 
         if screen is None:
             G.LOGGING.warning("Screen is None, may be locked")
+        elif not change_detector.changed(screen):
+            G.LOGGING.debug("Screen not changed, skip matching")
         else:
             if threshold:
                 query.threshold = threshold
-            match_pos = query.match_in(screen)
+            with pacer.matching():
+                image = _decode_screen(screen, query.rgb)
+                match_pos = None if image is None else query.match_in(image, dirty_rects=change_detector.dirty_rects)
             if match_pos:
                 try_log_screen(screen)
                 return match_pos
@@ -59,7 +88,216 @@ def loop_find(query, timeout=ST.FIND_TIMEOUT, threshold=None, interval=0.5, inte
             try_log_screen(screen)
             raise TargetNotFoundError('Picture %s not found in screen' % query)
         else:
-            time.sleep(interval)
+            pacer.wait()
+
+
+@logwrap
+def loop_find_any(queries, timeout=ST.FIND_TIMEOUT, threshold=None, interval=0.5, intervalfunc=None):
+    """
+    Search for any of the image templates in the screen until timeout, each attempt takes only one screenshot
+    which is shared by all the templates
+
+    Args:
+        queries: list of image templates in priority order
+        timeout: time interval how long to look for the image templates
+        threshold: default is None
+        interval: sleep interval before next attempt to find the image templates
+        intervalfunc: function that is executed after unsuccessful attempt to find the image templates
+
+    Raises:
+        TargetNotFoundError: when none of the image templates is found in screenshot
+
+    Returns:
+        (query, pos) of the first image template found in the order of `queries`
+
+    """
+    G.LOGGING.info("Try finding any of:\n%s", queries)
+    start_time = time.time()
+    change_detector = FrameChangeDetector()
+    pacer = FramePacer(interval)
+    while True:
+        pacer.start()
+        screen = _snapshot()
+
+        if screen is None:
+            G.LOGGING.warning("Screen is None, may be locked")
+        elif not change_detector.changed(screen):
+            G.LOGGING.debug("Screen not changed, skip matching")
+        else:
+            if threshold:
+                for query in queries:
+                    query.threshold = threshold
+            with pacer.matching():
+                match_results = match_many(queries, screen, first_only=True, dirty_rects=change_detector.dirty_rects)
+            if match_results:
+                try_log_screen(screen)
+                query, match_pos, _ = match_results[0]
+                return query, match_pos
+
+        if intervalfunc is not None:
+            intervalfunc()
+
+        if (time.time() - start_time) > timeout:
+            try_log_screen(screen)
+            raise TargetNotFoundError('None of pictures %s found in screen' % queries)
+        else:
+            pacer.wait()
+
+
+def _snapshot():
+    """
+    Take a screenshot for matching, it is an ``aircv.LazyFrame`` decoded on demand if the device supports it,
+    otherwise an image. None if no valid screenshot is taken.
+    """
+    snapshot_frame = getattr(G.DEVICE, "snapshot_frame", None)
+    if snapshot_frame is None:
+        return G.DEVICE.snapshot(filename=None)
+    frame = snapshot_frame()
+    if frame is None or frame.resolution is None:
+        return None
+    # the thumbnail is needed by FrameChangeDetector anyway, decoding it checks the frame cheaply
+    if ST.FRAME_DIFF_THRESHOLD is not None and frame.thumbnail(aircv.utils.FRAME_THUMBNAIL_WIDTH) is None:
+        return None
+    return frame
+
+
+def _decode_screen(screen, rgb=True):
+    """
+    Decode the screenshot taken by `_snapshot`, full color only for rgb check, otherwise gray scale is enough.
+    None if the screenshot can not be decoded.
+    """
+    if not isinstance(screen, aircv.LazyFrame):
+        return screen
+    image = screen.color() if rgb else screen.gray()
+    if image is None:
+        G.LOGGING.warning("Screen can not be decoded")
+    return image
+
+
+def match_many(queries, screen, first_only=False, dirty_rects=None):
+    """
+    Match image templates against one screenshot, the gray scale screen is calculated only once
+    and shared by all the templates without rgb check
+
+    Args:
+        queries: list of image templates in priority order
+        screen: screenshot to search in, an image or an ``aircv.LazyFrame``
+        first_only: stop at the first image template found
+        dirty_rects: changed regions since the last missed screenshot, see `FrameChangeDetector`
+
+    Returns:
+        list of (query, pos, confidence) for every image template found, in the order of `queries`
+
+    """
+    screen_gray = None
+    result = []
+    for query in queries:
+        if query.rgb:
+            image = _decode_screen(screen)
+        else:
+            if screen_gray is None:
+                screen_gray = _decode_screen(screen, rgb=False)
+                if screen_gray is not None:
+                    screen_gray = aircv.utils.img_mat_rgb_2_gray(screen_gray)
+            image = screen_gray
+        if image is None:
+            break
+        match_result = query._cv_match(image, dirty_rects=dirty_rects)
+        G.LOGGING.debug("match result of %s: %s", query, match_result)
+        if not match_result:
+            continue
+        focus_pos = TargetPos().getXY(match_result, query.target_pos)
+        result.append((query, focus_pos, match_result["confidence"]))
+        if first_only:
+            break
+    return result
+
+
+class FrameChangeDetector(object):
+    """
+    Tell whether a screenshot differs from the last matched one, so that polling loops can reuse the previous miss
+    on unchanged frames. Frames are compared by ``aircv.utils.frame_fingerprint``, the threshold is
+    ``ST.FRAME_DIFF_THRESHOLD``.
+
+    After a changed screen, ``dirty_rects`` holds the changed regions [(x_min, y_min, x_max, y_max), ...],
+    or None when the whole screen has to be matched.
+    """
+
+    def __init__(self):
+        self.fingerprint = None
+        self.dirty_rects = None
+
+    def changed(self, screen):
+        """
+        Check the screen, the fingerprint is updated only when the screen is regarded as changed,
+        so that slow gradual changes still add up
+
+        Args:
+            screen: screenshot
+
+        Returns:
+            True if the screen needs to be matched again
+
+        """
+        self.dirty_rects = None
+        if ST.FRAME_DIFF_THRESHOLD is None:
+            return True
+        if isinstance(screen, aircv.LazyFrame):
+            # decoded at a reduced scale
+            fingerprint = aircv.utils.frame_fingerprint(screen.thumbnail(aircv.utils.FRAME_THUMBNAIL_WIDTH))
+            resolution = screen.resolution
+        else:
+            fingerprint = aircv.utils.frame_fingerprint(screen)
+            resolution = aircv.get_resolution(screen)
+        if not aircv.utils.frame_changed(self.fingerprint, fingerprint, ST.FRAME_DIFF_THRESHOLD):
+            return False
+        if ST.DIRTY_REGION_RATIO and self.fingerprint is not None and self.fingerprint.shape == fingerprint.shape:
+            self.dirty_rects = aircv.utils.frame_diff_rects(self.fingerprint, fingerprint, resolution)
+        self.fingerprint = fingerprint
+        return True
+
+
+class FramePacer(object):
+    """
+    Pace the attempts of polling loops. By default it sleeps `interval` between attempts.
+
+    With ``ST.FIND_FRAME_DRIVEN`` on and a device providing ``wait_new_frame`` (stream capture backends),
+    the next attempt starts as soon as a new frame is available, limited by ``ST.FIND_MAX_FPS`` and by
+    ``ST.FIND_CPU_BUDGET``, the max ratio of time spent on matching.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._attempt_start = time.time()
+        self._match_cost = 0
+
+    def start(self):
+        """Call at the beginning of each attempt."""
+        self._attempt_start = time.time()
+        self._match_cost = 0
+
+    @contextmanager
+    def matching(self):
+        """Measure the time spent on matching in this attempt."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._match_cost += time.time() - start
+
+    def wait(self):
+        """Wait before the next attempt."""
+        wait_new_frame = getattr(G.DEVICE, "wait_new_frame", None) if ST.FIND_FRAME_DRIVEN else None
+        if wait_new_frame is None:
+            time.sleep(self.interval)
+            return
+        # keep within the max fps and the cpu budget
+        delay = max(1.0 / ST.FIND_MAX_FPS - (time.time() - self._attempt_start),
+                    self._match_cost * (1.0 / ST.FIND_CPU_BUDGET - 1), 0)
+        time.sleep(delay)
+        if not wait_new_frame(timeout=max(self.interval - delay, 0)):
+            # the capture backend can not tell when a new frame comes
+            time.sleep(max(self.interval - delay, 0))
 
 
 @logwrap
@@ -68,7 +306,8 @@ def try_log_screen(screen=None):
     Save screenshot to file
 
     Args:
-        screen: screenshot to be saved
+        screen: screenshot to be saved, an image or an ``aircv.LazyFrame`` whose jpg data is saved without
+            encoding if it is not rotated
 
     Returns:
         None
@@ -77,10 +316,19 @@ def try_log_screen(screen=None):
     if not ST.LOG_DIR:
         return
     if screen is None:
-        screen = G.DEVICE.snapshot()
+        snapshot_frame = getattr(G.DEVICE, "snapshot_frame", None)
+        screen = G.DEVICE.snapshot() if snapshot_frame is None else snapshot_frame()
     filename = "%(time)d.jpg" % {'time': time.time() * 1000}
     filepath = os.path.join(ST.LOG_DIR, filename)
-    aircv.imwrite(filepath, screen)
+    if isinstance(screen, aircv.LazyFrame):
+        save = screen.save
+    else:
+        save = functools.partial(aircv.imwrite, img=screen)
+    if G.LOGGER.writer:
+        # encoded and written in background, in order with the log lines
+        G.LOGGER.writer.submit(save, filepath)
+    else:
+        save(filepath)
     return filename
 
 
@@ -92,9 +340,11 @@ class Template(object):
     record_pos: pos in screen when recording
     resolution: screen resolution when recording
     rgb: 识别结果是否使用rgb三通道进行校验.
+    cvstrategy: 该模板使用的识别策略, 默认为None即使用ST.CVSTRATEGY(find_all使用ST.FIND_ALL_CVSTRATEGY).
     """
 
-    def __init__(self, filename, threshold=None, target_pos=TargetPos.MID, record_pos=None, resolution=(), rgb=False):
+    def __init__(self, filename, threshold=None, target_pos=TargetPos.MID, record_pos=None, resolution=(), rgb=False,
+                 cvstrategy=None):
         self.filename = filename
         self._filepath = None
         self.threshold = threshold or ST.THRESHOLD
@@ -102,6 +352,7 @@ class Template(object):
         self.record_pos = record_pos
         self.resolution = resolution
         self.rgb = rgb
+        self.cvstrategy = cvstrategy
 
     @property
     def filepath(self):
@@ -118,8 +369,8 @@ class Template(object):
         filepath = self.filepath if PY3 else self.filepath.encode(sys.getfilesystemencoding())
         return "Template(%s)" % filepath
 
-    def match_in(self, screen):
-        match_result = self._cv_match(screen)
+    def match_in(self, screen, dirty_rects=None):
+        match_result = self._cv_match(screen, dirty_rects=dirty_rects)
         G.LOGGING.debug("match result: %s", match_result)
         if not match_result:
             return None
@@ -127,34 +378,148 @@ class Template(object):
         return focus_pos
 
     def match_all_in(self, screen):
-        image = self._imread()
-        image = self._resize_image(image, screen, ST.RESIZE_METHOD)
-        return self._find_all_template(image, screen)
+        image, image_gray = self._get_images(screen)
+        ret = None
+        for method in self.cvstrategy or ST.FIND_ALL_CVSTRATEGY:
+            if method == "tpl":
+                ret = self._try_match(self._find_all_template, image if self.rgb else image_gray, screen)
+            elif method == "sift" or method in aircv.KEYPOINT_METHODS:
+                ret = self._try_match(self._find_all_keypoint, image, screen, method)
+            else:
+                G.LOGGING.warning("Undefined method in FIND_ALL_CVSTRATEGY: %s", method)
+            if ret:
+                break
+        return ret
 
     @logwrap
-    def _cv_match(self, screen):
+    def _cv_match(self, screen, dirty_rects=None):
         # in case image file not exist in current directory:
-        image = self._imread()
-        image = self._resize_image(image, screen, ST.RESIZE_METHOD)
+        image, image_gray = self._get_images(screen)
+        strategies = self.cvstrategy or ST.CVSTRATEGY
+        # the previous miss still holds outside the changed regions
+        regions = self._get_dirty_regions(dirty_rects, image, screen) if dirty_rects and ST.DIRTY_REGION_RATIO else None
+        if regions is not None:
+            G.LOGGING.debug("match in changed regions: %s", regions)
+        if ST.CVSTRATEGY_CONCURRENT and len(strategies) > 1:
+            return self._cv_match_concurrently(strategies, image, image_gray, screen, regions)
         ret = None
-        for method in ST.CVSTRATEGY:
-            if method == "tpl":
-                ret = self._try_match(self._find_template, image, screen)
-            elif method == "sift":
-                ret = self._try_match(self._find_sift_in_predict_area, image, screen)
-                if not ret:
-                    ret = self._try_match(self._find_sift, image, screen)
-            else:
-                G.LOGGING.warning("Undefined method in CV_STRATEGY: %s", method)
+        for method in strategies:
+            ret = self._match_with_method(method, image, image_gray, screen, regions)
             if ret:
                 break
         return ret
 
     @staticmethod
-    def _try_match(method, *args, **kwargs):
-        G.LOGGING.debug("try match with %s" % method.__name__)
+    def _get_dirty_regions(dirty_rects, image, screen):
+        """
+        Expand the changed rects by the template size, so that every match window touching the changes is included,
+        overlapping regions are merged. Returns None if the regions are too large to pay off.
+        """
+        h, w = image.shape[:2]
+        screen_w, screen_h = aircv.get_resolution(screen)
+        regions = [(max(0, x_min - w), max(0, y_min - h), min(screen_w, x_max + w), min(screen_h, y_max + h))
+                   for x_min, y_min, x_max, y_max in dirty_rects]
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(regions)):
+                for j in range(i + 1, len(regions)):
+                    r1, r2 = regions[i], regions[j]
+                    if r1[0] < r2[2] and r2[0] < r1[2] and r1[1] < r2[3] and r2[1] < r1[3]:
+                        regions[i] = (min(r1[0], r2[0]), min(r1[1], r2[1]), max(r1[2], r2[2]), max(r1[3], r2[3]))
+                        regions.pop(j)
+                        merged = True
+                        break
+                if merged:
+                    break
+        area = sum((x_max - x_min) * (y_max - y_min) for x_min, y_min, x_max, y_max in regions)
+        if area >= ST.DIRTY_REGION_RATIO * screen_w * screen_h:
+            return None
+        return regions
+
+    def _cv_match_concurrently(self, strategies, image, image_gray, screen, regions=None):
+        """
+        Run all the strategies on the shared thread pool
+
+        The result is the same as running them one by one: it is returned as soon as one strategy succeeds
+        and all the strategies before it have failed, strategies not started yet are skipped.
+        """
+        done = queue.Queue()
+        cancelled = threading.Event()
+
+        def run(idx, method):
+            if cancelled.is_set():
+                done.put((idx, None, None))
+                return
+            try:
+                done.put((idx, self._match_with_method(method, image, image_gray, screen, regions), None))
+            except Exception as err:
+                done.put((idx, None, err))
+
+        pool = _get_strategy_pool()
+        for idx, method in enumerate(strategies):
+            pool.apply_async(run, (idx, method))
+
+        results, next_idx = {}, 0
+        try:
+            while next_idx < len(strategies):
+                idx, ret, err = done.get()
+                results[idx] = (ret, err)
+                # decide in priority order
+                while next_idx in results:
+                    ret, err = results.pop(next_idx)
+                    if err is not None:
+                        raise err
+                    if ret:
+                        return ret
+                    next_idx += 1
+            return None
+        finally:
+            cancelled.set()
+
+    def _match_with_method(self, method, image, image_gray, screen, regions=None):
+        if regions is not None:
+            return self._match_in_regions(method, image, image_gray, screen, regions)
+        ret = None
+        if method == "tpl":
+            image_tpl = image if self.rgb else image_gray
+            ret = self._try_match(self._find_template_in_predict_area, image_tpl, screen)
+            if not ret:
+                ret = self._try_match(self._find_template, image_tpl, screen)
+        elif method == "sift":
+            ret = self._try_match(self._find_sift_in_predict_area, image, screen)
+            if not ret:
+                ret = self._try_match(self._find_sift, image, screen)
+        elif method in aircv.KEYPOINT_METHODS:
+            ret = self._try_match(self._find_keypoint_in_predict_area, image, screen, method)
+            if not ret:
+                ret = self._try_match(self._find_keypoint, image, screen, method)
+        else:
+            G.LOGGING.warning("Undefined method in CV_STRATEGY: %s", method)
+        return ret
+
+    def _match_in_regions(self, method, image, image_gray, screen, regions):
+        if method == "tpl":
+            find_func, kwargs = aircv.find_template, {"pyramid_levels": ST.TPL_PYRAMID_LEVELS}
+            image = image if self.rgb else image_gray
+        elif method == "sift":
+            find_func, kwargs = aircv.find_sift, {}
+        elif method in aircv.KEYPOINT_METHODS:
+            find_func, kwargs = aircv.find_keypoint, {"method": method}
+        else:
+            G.LOGGING.warning("Undefined method in CV_STRATEGY: %s", method)
+            return None
+        for rect in regions:
+            ret = self._try_match(self._find_in_area, find_func, image, screen, rect, **kwargs)
+            if ret:
+                return ret
+        return None
+
+    @staticmethod
+    def _try_match(func, *args, **kwargs):
+        G.LOGGING.debug("try match with %s" % func.__name__)
         try:
-            ret = method(*args, **kwargs)
+            ret = func(*args, **kwargs)
         except aircv.BaseError as err:
             G.LOGGING.debug(repr(err))
             return None
@@ -164,34 +529,99 @@ class Template(object):
     def _imread(self):
         return aircv.imread(self.filepath)
 
+    def _get_images(self, screen=None):
+        """
+        Get the template image and its gray scale version, resized to fit the screen if given.
+
+        Decoded and resized images are kept in ``TEMPLATE_CACHE``, the key is made of file path, mtime,
+        record resolution, screen resolution and ``ST.RESIZE_METHOD``.
+        """
+        if TEMPLATE_CACHE.maxsize != ST.TEMPLATE_CACHE_SIZE:
+            TEMPLATE_CACHE.resize(ST.TEMPLATE_CACHE_SIZE)
+        filepath = self.filepath
+        try:
+            mtime = os.path.getmtime(filepath)
+        except OSError:
+            # not cached, let imread raise FileNotExistError
+            mtime = None
+        if screen is None or not self.resolution:
+            key = (filepath, mtime)
+        else:
+            key = (filepath, mtime, tuple(self.resolution), aircv.get_resolution(screen), ST.RESIZE_METHOD)
+        images = TEMPLATE_CACHE.get(key)
+        if images is not None:
+            return images
+        if len(key) == 2:
+            image = self._imread()
+        else:
+            origin = self._get_images()
+            image = self._resize_image(origin[0], screen, ST.RESIZE_METHOD)
+            if image is origin[0]:
+                # same resolution, no need to cache it twice
+                return origin
+        images = (image, aircv.utils.img_mat_rgb_2_gray(image))
+        if mtime is not None:
+            TEMPLATE_CACHE.set(key, images)
+        return images
+
     def _find_all_template(self, image, screen):
         return aircv.find_all_template(screen, image, threshold=self.threshold, rgb=self.rgb)
 
+    def _find_all_keypoint(self, image, screen, method="sift"):
+        if method == "sift":
+            return aircv.find_all_sift(screen, image, threshold=self.threshold, rgb=self.rgb)
+        return aircv.find_all_keypoint(screen, image, threshold=self.threshold, rgb=self.rgb, method=method)
+
     def _find_template(self, image, screen):
-        return aircv.find_template(screen, image, threshold=self.threshold, rgb=self.rgb)
+        return aircv.find_template(screen, image, threshold=self.threshold, rgb=self.rgb,
+                                   pyramid_levels=ST.TPL_PYRAMID_LEVELS)
 
     def _find_sift(self, image, screen):
         return aircv.find_sift(screen, image, threshold=self.threshold, rgb=self.rgb)
 
+    def _find_keypoint(self, image, screen, method="orb"):
+        return aircv.find_keypoint(screen, image, threshold=self.threshold, rgb=self.rgb, method=method)
+
+    def _find_template_in_predict_area(self, image, screen):
+        if ST.TPL_PREDICT_DEVIATION is None:
+            return None
+        # image has been resized to fit the screen already
+        return self._find_in_predict_area(aircv.find_template, image, screen, image_resolution=(),
+                                          deviation=ST.TPL_PREDICT_DEVIATION, pyramid_levels=ST.TPL_PYRAMID_LEVELS)
+
     def _find_sift_in_predict_area(self, image, screen):
+        return self._find_in_predict_area(aircv.find_sift, image, screen)
+
+    def _find_keypoint_in_predict_area(self, image, screen, method="orb"):
+        return self._find_in_predict_area(aircv.find_keypoint, image, screen, method=method)
+
+    def _find_in_predict_area(self, find_func, image, screen, image_resolution=None, deviation=None, **kwargs):
         if not self.record_pos:
             return None
+        if image_resolution is None:
+            image_resolution = self.resolution
         # calc predict area in screen
         image_wh, screen_resolution = aircv.get_resolution(image), aircv.get_resolution(screen)
-        xmin, ymin, xmax, ymax = Predictor.get_predict_area(self.record_pos, image_wh, self.resolution, screen_resolution)
-        # crop predict image from screen
-        predict_area = aircv.crop_image(screen, (xmin, ymin, xmax, ymax))
-        if not predict_area.any():
+        xmin, ymin, xmax, ymax = Predictor.get_predict_area(self.record_pos, image_wh, image_resolution,
+                                                            screen_resolution, deviation=deviation)
+        return self._find_in_area(find_func, image, screen, (xmin, ymin, xmax, ymax), **kwargs)
+
+    def _find_in_area(self, find_func, image, screen, rect, **kwargs):
+        """find target in the rect (x_min, y_min, x_max, y_max) of the screen, the result is mapped back to the screen"""
+        # area may be out of screen, keep the valid part
+        xmin, ymin = max(0, int(rect[0])), max(0, int(rect[1]))
+        xmax, ymax = max(0, int(rect[2])), max(0, int(rect[3]))
+        area = screen[ymin:ymax, xmin:xmax]
+        if not area.any():
             return None
-        # find sift in that image
-        ret_in_area = aircv.find_sift(predict_area, image, threshold=self.threshold, rgb=self.rgb)
+        # find target in that image
+        ret_in_area = find_func(area, image, threshold=self.threshold, rgb=self.rgb, **kwargs)
         # calc cv ret if found
         if not ret_in_area:
             return None
         ret = deepcopy(ret_in_area)
         if "rectangle" in ret:
-            for idx, item in enumerate(ret["rectangle"]):
-                ret["rectangle"][idx] = (item[0] + xmin, item[1] + ymin)
+            ret["rectangle"] = [(item[0] + xmin, item[1] + ymin) for item in ret["rectangle"]]
         ret["result"] = (ret_in_area["result"][0] + xmin, ret_in_area["result"][1] + ymin)
         return ret
 
@@ -247,14 +677,16 @@ class Predictor(object):
         return target_x, target_y
 
     @classmethod
-    def get_predict_area(cls, record_pos, image_wh, image_resolution=(), screen_resolution=()):
-        """Get predicted area in screen."""
+    def get_predict_area(cls, record_pos, image_wh, image_resolution=(), screen_resolution=(), deviation=None):
+        """Get predicted area in screen, ``deviation`` defaults to ``DEVIATION``."""
+        if deviation is None:
+            deviation = cls.DEVIATION
         x, y = cls.get_predict_point(record_pos, screen_resolution)
         # The prediction area should depend on the image size:
         if image_resolution:
-            predict_x_radius = int(image_wh[0] * screen_resolution[0] / (2 * image_resolution[0])) + cls.DEVIATION
-            predict_y_radius = int(image_wh[1] * screen_resolution[1] / (2 * image_resolution[1])) + cls.DEVIATION
+            predict_x_radius = int(image_wh[0] * screen_resolution[0] / (2 * image_resolution[0])) + deviation
+            predict_y_radius = int(image_wh[1] * screen_resolution[1] / (2 * image_resolution[1])) + deviation
         else:
-            predict_x_radius, predict_y_radius = int(image_wh[0] / 2) + cls.DEVIATION, int(image_wh[1] / 2) + cls.DEVIATION
+            predict_x_radius, predict_y_radius = int(image_wh[0] / 2) + deviation, int(image_wh[1] / 2) + deviation
         area = (x - predict_x_radius, y - predict_y_radius, x + predict_x_radius, y + predict_y_radius)
         return area
@@ -6,6 +6,7 @@ import sys
 import os
 from airtest.core.settings import Settings as ST
 from airtest.utils.logwraper import Logwrap, AirtestLogger
+from airtest.utils.asyncwriter import AsyncWriter
 from airtest.utils.logger import get_logger
 
 
@@ -52,7 +53,8 @@ helper functions
 def set_logdir(dirpath):
     """set log dir for logfile and screenshots.
 
-    And create dir at `dirpath/ST.SCREEN_DIR` for screenshots
+    And create dir at `dirpath/ST.SCREEN_DIR` for screenshots,
+    they are written in background if `ST.LOG_ASYNC` is set
 
     Args:
         dirpath: directory to save logfile and screenshots
@@ -64,6 +66,7 @@ def set_logdir(dirpath):
         os.mkdir(dirpath)
     ST.LOG_DIR = dirpath
     G.LOGGER.set_logfile(os.path.join(ST.LOG_DIR, ST.LOG_FILE))
+    G.LOGGER.set_writer(AsyncWriter(ST.LOG_QUEUE_SIZE) if ST.LOG_ASYNC else None)
 
 
 def log(message, traceback=""):
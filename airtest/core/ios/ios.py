@@ -166,31 +166,49 @@ class IOS(Device):
 
         # output cv2 object
         try:
-            screen = aircv.utils.string_2_img(data)
+            frame = self._get_frame(data, ensure_orientation)
+            screen = frame.color()
         except:
             # may be black/locked screen or other reason, print exc for debugging
             import traceback
             traceback.print_exc()
             return None
 
+        # save as file if needed
+        if filename and screen is not None:
+            frame.save(filename)
+
+        return screen
+
+    def snapshot_frame(self, ensure_orientation=True):
+        """
+        take snapshot without decoding it, see `aircv.LazyFrame`
+        ensure_orientation: keep the orientation same as display
+        """
+        if self.cap_method == CAP_METHOD.WDACAP:
+            data = self._neo_wda_screenshot()
+        else:
+            raise NotImplementedError
+        try:
+            return self._get_frame(data, ensure_orientation)
+        except:
+            import traceback
+            traceback.print_exc()
+            return None
+
+    def _get_frame(self, data, ensure_orientation=True):
         now_orientation = self.orientation
 
         # ensure the orientation is right
+        # wda 截图是要根据orientation旋转
+        rotation = 0
         if ensure_orientation and now_orientation in [LANDSCAPE, LANDSCAPE_RIGHT]:
-
-            # minicap screenshots are different for various sdk_version
-            if self.cap_method in (CAP_METHOD.MINICAP, CAP_METHOD.MINICAP_STREAM) and self.sdk_version <= 16:
-                h, w = screen.shape[:2]  # cvshape是高度在前面!!!!
-                if w < h:  # 当前是横屏，但是图片是竖的，则旋转，针对sdk<=16的机器
-                    screen = aircv.rotate(screen, self.display_info["orientation"] * 90, clockwise=False)
-
-            # wda 截图是要根据orientation旋转
-            elif self.cap_method == CAP_METHOD.WDACAP:
-                # seems need to rotate in opencv opencv-contrib-python==3.2.0.7
-                screen = aircv.rotate(screen, 90, clockwise=(now_orientation == LANDSCAPE_RIGHT))
+            # seems need to rotate in opencv opencv-contrib-python==3.2.0.7
+            rotation = 270 if now_orientation == LANDSCAPE_RIGHT else 90
+        frame = aircv.LazyFrame(data, rotation=rotation)
 
         # readed screen size
-        h, w = screen.shape[:2]
+        w, h = frame.resolution
 
         # save last res for portrait
         if now_orientation in [LANDSCAPE, LANDSCAPE_RIGHT]:
@@ -203,12 +221,7 @@ class IOS(Device):
         winw, winh = self.window_size()
 
         self._touch_factor = float(winh) / float(h)
-
-        # save as file if needed
-        if filename:
-            aircv.imwrite(filename, screen)
-
-        return screen
+        return frame
 
     @retry_session
     def touch(self, pos, duration=0.01):
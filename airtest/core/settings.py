@@ -8,11 +8,24 @@ class Settings(object):
     DEBUG = False
     LOG_DIR = None
     LOG_FILE = "log.txt"
+    LOG_ASYNC = False  # write screenshots and log lines on a background thread, flushed at exit, applied by set_logdir
+    LOG_QUEUE_SIZE = 32  # max pending writes of LOG_ASYNC, the test thread waits when it is reached
     RESIZE_METHOD = staticmethod(cocos_min_strategy)
     CVSTRATEGY = ["tpl", "sift"]
+    CVSTRATEGY_CONCURRENT = False  # run the strategies on a shared thread pool, the first successful one (by order) wins
+    FIND_ALL_CVSTRATEGY = ["tpl"]  # strategies of ``find_all``, add "sift"/"orb"/... for scale-tolerant matching
     THRESHOLD = 0.7  # [0, 1]
+    TPL_PREDICT_DEVIATION = 100  # "tpl" searches the predicted area (plus this radius) first, None to disable
+    TPL_PYRAMID_LEVELS = 0  # image pyramid levels for "tpl" coarse-to-fine search, 0 to search at full resolution
     THRESHOLD_STRICT = 0.7  # [0, 1]
     OPDELAY = 0.1
     FIND_TIMEOUT = 20
     FIND_TIMEOUT_TMP = 3
+    FIND_FRAME_DRIVEN = False  # loop_find waits for the next frame of stream capture backends instead of sleeping `interval`
+    FIND_MAX_FPS = 30  # frame driven loop_find: max attempts per second
+    FIND_CPU_BUDGET = 0.5  # frame driven loop_find: max ratio of time spent on matching
+    # loop_find matches again only when more than this ratio of the screen changed (e.g. 0), None to match every frame
+    FRAME_DIFF_THRESHOLD = None
+    DIRTY_REGION_RATIO = 0  # loop_find matches only the changed regions covering less than this ratio (e.g. 0.5), 0 to disable
+    TEMPLATE_CACHE_SIZE = 200 * 1024 * 1024  # bytes of decoded/resized template images to keep, 0 to disable
     PROJECT_ROOT = os.environ.get("PROJECT_ROOT", "")  # for ``using`` other script
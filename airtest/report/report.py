@@ -11,6 +11,7 @@ import traceback
 from copy import deepcopy
 from airtest.aircv import imread, get_resolution
 from airtest.cli.info import get_script_info
+from airtest.core.helper import G
 from airtest.utils.compat import decode_path
 from six import PY3
 from pprint import pprint
@@ -51,6 +52,8 @@ class LogToHtml(object):
                 traceback.print_exc()
 
     def _load(self):
+        # the log of the running script may be still in the writer
+        G.LOGGER.flush()
         logfile = self.logfile.encode(sys.getfilesystemencoding()) if not PY3 else self.logfile
         with io.open(logfile, encoding="utf-8") as f:
             for line in f.readlines():
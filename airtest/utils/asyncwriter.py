@@ -0,0 +1,89 @@
+# _*_ coding:UTF-8 _*_
+import threading
+import traceback
+from six.moves import queue
+from .logger import get_logger
+from .snippet import reg_cleanup
+LOGGING = get_logger(__name__)
+
+
+class AsyncWriter(object):
+    """
+    Run writing tasks on a background thread in the order they are submitted,
+    pending tasks are finished on exit
+
+    Args:
+        maxsize: max number of pending tasks, `submit` blocks when it is reached
+
+    """
+
+    def __init__(self, maxsize=32):
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        reg_cleanup(self.close)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)` on the background thread, or right away if the writer is closed
+
+        Args:
+            func: writing task
+            *args: optional arguments
+            **kwargs: optional arguments
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            if not self._closed:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="AsyncWriter")
+                    self._thread.daemon = True
+                    self._thread.start()
+                self._queue.put((func, args, kwargs))
+                return
+        func(*args, **kwargs)
+
+    def flush(self):
+        """
+        Wait until all the submitted tasks are done
+
+        Returns:
+            None
+
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Finish the pending tasks and stop the background thread, tasks submitted later run synchronously
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                func, args, kwargs = task
+                func(*args, **kwargs)
+            except Exception:
+                LOGGING.error("writing task failed:\n%s", traceback.format_exc())
+            finally:
+                self._queue.task_done()
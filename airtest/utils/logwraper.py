@@ -19,6 +19,7 @@ class AirtestLogger(object):
         self.running_stack = []
         self.logfile = None
         self.logfd = None
+        self.writer = None
         self.set_logfile(logfile)
         reg_cleanup(self.handle_stacked_log)
 
@@ -27,6 +28,22 @@ class AirtestLogger(object):
             self.logfile = os.path.realpath(logfile)
             self.logfd = open(self.logfile, "w")
 
+    def set_writer(self, writer):
+        """
+        Write the log lines with `writer` (an ``AsyncWriter``) in background, None to write synchronously.
+        The previous writer is closed after its pending lines are written.
+        """
+        if self.writer is not None and self.writer is not writer:
+            self.writer.close()
+        self.writer = writer
+
+    def flush(self):
+        """
+        Wait until the log lines (and screenshots) submitted to the writer are written, e.g. before the log is read
+        """
+        if self.writer is not None:
+            self.writer.flush()
+
     @staticmethod
     def _dumper(obj):
         if hasattr(obj, "to_json"):
@@ -49,8 +66,16 @@ class AirtestLogger(object):
 
         if self.logfd:
             log_data = json.dumps({'tag': tag, 'depth': depth, 'time': time.strftime("%Y-%m-%d %H:%M:%S"), 'data': data}, default=self._dumper)
-            self.logfd.write(log_data + '\n')
-            self.logfd.flush()
+            if self.writer:
+                # data is serialized here as it may be changed later, only the io is left to the writer
+                self.writer.submit(self._write, self.logfd, log_data)
+            else:
+                self._write(self.logfd, log_data)
+
+    @staticmethod
+    def _write(logfd, log_data):
+        logfd.write(log_data + '\n')
+        logfd.flush()
 
     def handle_stacked_log(self):
         # 处理stack中的log
@@ -0,0 +1,94 @@
+# _*_ coding:UTF-8 _*_
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Thread-safe LRU cache bounded by the total size of its values
+
+    Args:
+        maxsize: max total size of the cached values, least recently used entries are evicted first
+        getsizeof: function to get the size of a value, every value counts as 1 by default
+
+    """
+
+    def __init__(self, maxsize, getsizeof=None):
+        self.maxsize = maxsize
+        self.getsizeof = getsizeof or (lambda value: 1)
+        self.currsize = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """
+        Get the cached value and mark it as most recently used
+
+        Args:
+            key: cache key
+            default: returned when key is not cached
+
+        Returns:
+            cached value or default
+
+        """
+        with self._lock:
+            try:
+                item = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = item
+            return item[0]
+
+    def set(self, key, value):
+        """
+        Put value into the cache, values larger than `maxsize` are not cached
+
+        Args:
+            key: cache key
+            value: value to be cached
+
+        Returns:
+            None
+
+        """
+        size = self.getsizeof(value)
+        with self._lock:
+            if key in self._data:
+                self.currsize -= self._data.pop(key)[1]
+            if size > self.maxsize:
+                return
+            self._data[key] = (value, size)
+            self.currsize += size
+            self._evict()
+
+    def resize(self, maxsize):
+        """
+        Change `maxsize` and evict entries exceeding it
+
+        Args:
+            maxsize: new max total size
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.currsize = 0
+
+    def _evict(self):
+        while self._data and self.currsize > self.maxsize:
+            _, (_, size) = self._data.popitem(last=False)
+            self.currsize -= size
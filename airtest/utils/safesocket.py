@@ -9,7 +9,9 @@ class SafeSocket(object):
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         else:
             self.sock = sock
-        self.buf = b""
+        # reusable receive buffer, and the number of bytes received in it for an interrupted recv
+        self._buffer = bytearray()
+        self._received = 0
 
     # PEP 3113 -- Removal of Tuple Parameter Unpacking
     # https://www.python.org/dev/peps/pep-3113/
@@ -26,13 +28,25 @@ class SafeSocket(object):
             totalsent += sent
 
     def recv(self, size):
-        while len(self.buf) < size:
-            trunk = self.sock.recv(min(size-len(self.buf), 4096))
-            if trunk == b"":
+        return self.recv_view(size).tobytes()
+
+    def recv_view(self, size):
+        """
+        recv exactly `size` bytes into the reusable buffer without extra copies,
+        the returned memoryview is only valid until the next recv
+        """
+        if len(self._buffer) < size:
+            buffer = bytearray(size)
+            buffer[:self._received] = self._buffer[:self._received]
+            self._buffer = buffer
+        view = memoryview(self._buffer)
+        while self._received < size:
+            nbytes = self.sock.recv_into(view[self._received:size], size - self._received)
+            if nbytes == 0:
                 raise socket.error("socket connection broken")
-            self.buf += trunk
-        ret, self.buf = self.buf[:size], self.buf[size:]
-        return ret
+            self._received += nbytes
+        self._received = 0
+        return view[:size]
 
     def recv_with_timeout(self, size, timeout=2):
         self.sock.settimeout(timeout)
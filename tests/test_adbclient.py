@@ -0,0 +1,510 @@
+# encoding=utf-8
+from airtest.core.android.adb import ADB, AdbError, AdbShellError
+from airtest.core.android.adbclient import AdbClient, ShellSession, ShellSessionError, ShellPool
+import os
+import re
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+SERIALNO = "fake-serial"
+
+
+class FakeAdbServer(object):
+    """adb server speaking a subset of the host protocol, the device runs `echo`, `getprop` and `fail` only"""
+
+    # command script written by ShellSession
+    SCRIPT = re.compile(br'\( (.*?)\n\) </dev/null; __airtest_rc=\$\?; echo "(\w+)""(\w) \$__airtest_rc"'
+                        br'(; echo "\w+""\w" >&2)?\n', re.S)
+
+    def __init__(self, shell_v2=True):
+        self.shell_v2 = shell_v2
+        self.transports = 0
+        self.commands = []
+        self.outputs = {}
+        # line ending of the one-shot shell output
+        self.line_ending = b"\n"
+        self.props = {"ro.build.version.sdk": "25", "ro.product.model": "Fake", "sys.boot_completed": "1"}
+        self.files = {"/sdcard": None}
+        self.forwards = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        t = threading.Thread(target=self._serve)
+        t.daemon = True
+        t.start()
+
+    def close(self):
+        self.sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                return
+            t = threading.Thread(target=self._handle, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    @staticmethod
+    def _recv(conn, size):
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise socket.error("closed")
+            data += chunk
+        return data
+
+    def _request(self, conn):
+        length = int(self._recv(conn, 4), 16)
+        return self._recv(conn, length).decode("utf-8")
+
+    @staticmethod
+    def _message(data):
+        return ("%04x" % len(data)).encode("ascii") + data
+
+    def _handle(self, conn):
+        try:
+            service = self._request(conn)
+            host_serial = "host-serial:%s:" % SERIALNO
+            if service == "host:devices":
+                conn.sendall(b"OKAY" + self._message(("%s\tdevice\n" % SERIALNO).encode("utf-8")))
+            elif service.startswith("host-serial:") and not service.startswith(host_serial):
+                conn.sendall(b"FAIL" + self._message(b"device 'unknown' not found"))
+            elif service == host_serial + "get-state":
+                conn.sendall(b"OKAY" + self._message(b"device"))
+            elif service == host_serial + "features":
+                conn.sendall(b"OKAY" + self._message(b"shell_v2,cmd" if self.shell_v2 else b"cmd"))
+            elif service.startswith(host_serial + "forward:"):
+                local, remote = service[len(host_serial + "forward:"):].replace("norebind:", "").split(";")
+                self.forwards.append((local, remote))
+                conn.sendall(b"OKAYOKAY")
+            elif service == host_serial + "list-forward":
+                out = "".join("%s %s %s\n" % (SERIALNO, local, remote) for local, remote in self.forwards)
+                conn.sendall(b"OKAY" + self._message(out.encode("utf-8")))
+            elif service.startswith(host_serial + "killforward:"):
+                local = service[len(host_serial + "killforward:"):]
+                self.forwards = [f for f in self.forwards if f[0] != local]
+                conn.sendall(b"OKAYOKAY")
+            elif service == "host:transport:%s" % SERIALNO:
+                self.transports += 1
+                conn.sendall(b"OKAY")
+                self._handle_device(conn, self._request(conn))
+            else:
+                conn.sendall(b"FAIL" + self._message(b"unknown service"))
+        except socket.error:
+            pass
+        finally:
+            conn.close()
+
+    def _run(self, cmd):
+        if "; " in cmd:
+            # commands chained by shell_batch, with $? and quotes in echo
+            stdout, stderr, exit_code = b"", b"", 0
+            for part in cmd.split("; "):
+                out, err, exit_code = self._run(part.replace("$?", str(exit_code)))
+                stdout, stderr = stdout + out, stderr + err
+            return stdout, stderr, exit_code
+        args = cmd.split()
+        self.commands.append(cmd)
+        if cmd == "exit":
+            # run in a subshell of the session
+            return b"", b"", 0
+        elif args[0] == "echo":
+            return (" ".join(args[1:]).replace('"', '') + "\n").encode("utf-8"), b"", 0
+        elif cmd == "dumpsys window policy":
+            return b"    mScreenOnFully=true\n    mShowingLockscreen=false\n", b"", 0
+        elif cmd in self.outputs:
+            return self.outputs[cmd].encode("utf-8"), b"", 0
+        elif args[0] == "getprop" and len(args) > 1:
+            return (self.props.get(args[1], "") + "\n").encode("utf-8"), b"", 0
+        elif args[0] == "getprop":
+            out = "".join("[%s]: [%s]\n" % item for item in sorted(self.props.items()))
+            return out.encode("utf-8"), b"", 0
+        elif args[0] == "stty":
+            return b"", b"", 0
+        return b"", b"failed\n", 1
+
+    def _handle_device(self, conn, service):
+        conn.sendall(b"OKAY")
+        if service in ("shell,v2,raw:", "shell:"):
+            self._handle_interactive(conn, v2=service != "shell:")
+        elif service.startswith("shell,v2,raw:"):
+            stdout, stderr, exit_code = self._run(service[len("shell,v2,raw:"):])
+            stdout = stdout.replace(b"\n", self.line_ending)
+            self._recv(conn, 5)  # close stdin
+            conn.sendall(struct.pack("<BI", 1, len(stdout)) + stdout + struct.pack("<BI", 2, len(stderr)) + stderr +
+                         struct.pack("<BIB", 3, 1, exit_code))
+        elif service.startswith("shell:") or service.startswith("exec:"):
+            stdout, stderr, _ = self._run(service.split(":", 1)[1])
+            conn.sendall((stdout + stderr).replace(b"\n", self.line_ending))
+        elif service == "sync:":
+            self._handle_sync(conn)
+
+    def _handle_interactive(self, conn, v2):
+        stdin = b""
+        while True:
+            if v2:
+                packet_id, length = struct.unpack("<BI", self._recv(conn, 5))
+                stdin += self._recv(conn, length)
+            else:
+                stdin += conn.recv(1024)
+            m = self.SCRIPT.search(stdin)
+            if not m:
+                continue
+            stdin = stdin[m.end():]
+            cmd = m.group(1).decode("utf-8")
+            if cmd == "kill-session":
+                return
+            elif cmd == "hang":
+                continue
+            stdout, stderr, exit_code = self._run(cmd)
+            sentinel = m.group(2) + m.group(3)
+            stdout += sentinel + (" %d\n" % exit_code).encode("ascii")
+            if v2:
+                stderr += sentinel + b"\n"
+                conn.sendall(struct.pack("<BI", 1, len(stdout)) + stdout + struct.pack("<BI", 2, len(stderr)) + stderr)
+            else:
+                conn.sendall((stderr + stdout).replace(b"\n", b"\r\n"))
+
+    def _handle_sync(self, conn):
+        while True:
+            sync_id, length = struct.unpack("<4sI", self._recv(conn, 8))
+            path = self._recv(conn, length).decode("utf-8") if length else ""
+            if sync_id == b"STAT":
+                mode = 0o40755 if path in self.files and self.files[path] is None else 0
+                conn.sendall(b"STAT" + struct.pack("<III", mode, 0, 0))
+            elif sync_id == b"SEND":
+                remote = path.rsplit(",", 1)[0]
+                data = b""
+                while True:
+                    sync_id, length = struct.unpack("<4sI", self._recv(conn, 8))
+                    if sync_id == b"DONE":
+                        break
+                    data += self._recv(conn, length)
+                if remote.startswith("/system/"):
+                    msg = b"Read-only file system"
+                    conn.sendall(b"FAIL" + struct.pack("<I", len(msg)) + msg)
+                    continue
+                self.files[remote] = data
+                conn.sendall(b"OKAY" + struct.pack("<I", 0))
+            elif sync_id == b"RECV":
+                data = self.files.get(path)
+                if data is None:
+                    msg = b"No such file or directory"
+                    conn.sendall(b"FAIL" + struct.pack("<I", len(msg)) + msg)
+                    continue
+                for i in range(0, len(data), 3):
+                    chunk = data[i:i + 3]
+                    conn.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                conn.sendall(b"DONE" + struct.pack("<I", 0))
+            elif sync_id == b"QUIT":
+                return
+
+
+class TestAdbClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeAdbServer()
+        self.client = AdbClient(port=self.server.port, serialno=SERIALNO)
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_host_services(self):
+        self.assertEqual(self.client.devices(), [(SERIALNO, "device")])
+        self.assertEqual(self.client.get_state(), "device")
+        with self.assertRaises(AdbError) as cm:
+            AdbClient(port=self.server.port, serialno="unknown").get_state()
+        self.assertIn("not found", cm.exception.stderr)
+
+    def test_shell(self):
+        self.assertEqual(self.client.shell("echo hello"), (b"hello\n", b"", 0))
+        self.assertEqual(self.client.shell("fail"), (b"", b"failed\n", 1))
+        self.server.shell_v2 = False
+        client = AdbClient(port=self.server.port, serialno=SERIALNO)
+        self.assertEqual(client.shell("fail"), (b"failed\n", b"", None))
+
+    def test_forward(self):
+        self.client.forward("tcp:11111", "localabstract:minicap")
+        self.assertEqual(self.client.list_forward(), "%s tcp:11111 localabstract:minicap\n" % SERIALNO)
+        self.client.remove_forward("tcp:11111")
+        self.assertEqual(self.client.list_forward(), "")
+
+    def test_push_pull(self):
+        tmpdir = tempfile.mkdtemp()
+        local = os.path.join(tmpdir, "file.bin")
+        data = os.urandom(1000)
+        with open(local, "wb") as f:
+            f.write(data)
+        # pushed into the directory
+        self.client.push(local, "/sdcard")
+        self.assertEqual(self.server.files["/sdcard/file.bin"], data)
+        pulled = os.path.join(tmpdir, "pulled.bin")
+        self.client.pull("/sdcard/file.bin", pulled)
+        with open(pulled, "rb") as f:
+            self.assertEqual(f.read(), data)
+        with self.assertRaises(AdbError):
+            self.client.pull("/sdcard/not_exist", pulled)
+        self.assertFalse(os.path.exists(pulled))
+        with self.assertRaises(AdbError) as cm:
+            self.client.push(local, "/system/file.bin")
+        self.assertEqual(cm.exception.stderr, "Read-only file system")
+
+
+class TestShellSession(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeAdbServer()
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_run(self):
+        for shell_v2 in (True, False):
+            self.server.shell_v2 = shell_v2
+            session = ShellSession(AdbClient(port=self.server.port, serialno=SERIALNO))
+            for i in range(12):
+                stdout, stderr, exit_code = session.run("echo hello %s" % i)
+                self.assertEqual(stdout.replace(b"\r\n", b"\n"), ("hello %s\n" % i).encode("utf-8"))
+                self.assertEqual(exit_code, 0)
+            stdout, stderr, exit_code = session.run("fail")
+            self.assertEqual(exit_code, 1)
+            self.assertEqual(stderr if shell_v2 else stdout, b"failed\n" if shell_v2 else b"failed\r\n")
+            session.close()
+
+    def test_exit(self):
+        session = ShellSession(AdbClient(port=self.server.port, serialno=SERIALNO))
+        self.assertEqual(session.run("exit")[2], 0)
+        self.assertEqual(session.run("echo ok")[0], b"ok\n")
+        with self.assertRaises(socket.error):
+            session.run("kill-session")
+        self.assertFalse(session.alive)
+
+    def test_timeout(self):
+        session = ShellSession(AdbClient(port=self.server.port, serialno=SERIALNO), timeout=0.5)
+        # unclosed quotes are rejected before they are written to the shell
+        with self.assertRaises(ShellSessionError):
+            session.run("echo 'hello")
+        self.assertTrue(session.alive)
+        with self.assertRaises(socket.timeout):
+            session.run("hang")
+        self.assertFalse(session.alive)
+
+    def test_pool(self):
+        pool = ShellPool(AdbClient(port=self.server.port, serialno=SERIALNO), size=2)
+        transports = self.server.transports
+        results = []
+
+        def run():
+            for i in range(10):
+                results.append(pool.run("echo %s" % i)[0])
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(results), 40)
+        self.assertLessEqual(self.server.transports - transports, 2)
+        # broken session is replaced
+        with self.assertRaises(socket.error):
+            pool.run("kill-session")
+        self.assertEqual(pool.run("echo ok")[0], b"ok\n")
+        pool.close()
+
+
+class TestNativeADB(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeAdbServer()
+        self.adb = ADB(SERIALNO, server_addr=("127.0.0.1", self.server.port), native=True)
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_shell(self):
+        self.assertEqual(self.adb.sdk_version, 25)
+        self.assertEqual(self.adb.shell("echo hello"), "hello\n")
+        with self.assertRaises(AdbShellError):
+            self.adb.shell("fail")
+
+    def test_cmd(self):
+        self.assertEqual(self.adb.get_status(), "device")
+        self.assertEqual(self.adb.devices(), [(SERIALNO, "device")])
+        self.adb.forward("tcp:11111", "tcp:22222")
+        self.assertEqual(list(self.adb.get_forwards()), [(SERIALNO, "tcp:11111", "tcp:22222")])
+        self.adb.remove_forward("tcp:11111")
+        self.assertEqual(list(self.adb.get_forwards()), [])
+        self.assertEqual(self.adb.cmd("exec-out echo raw", ensure_unicode=False), b"raw\n")
+        with self.assertRaises(AdbError):
+            self.adb.pull("/sdcard/not_exist", tempfile.mkdtemp())
+
+    def test_getprop(self):
+        self.adb.PROPS_TTL = 60
+        self.assertEqual(self.adb.sdk_version, 25)
+        self.assertEqual(self.adb.getprop("ro.product.model"), "Fake")
+        self.assertEqual(self.adb.getprop("sys.boot_completed"), "1")
+        self.assertEqual(self.adb.getprop("ro.not_exist"), "")
+        self.assertEqual(self.server.commands.count("getprop"), 1)
+        self.server.props["sys.boot_completed"] = "0"
+        self.assertEqual(self.adb.getprop("sys.boot_completed"), "1")
+        # mutable properties expire, read-only ones are kept until refresh
+        self.adb.PROPS_TTL = 0
+        time.sleep(0.01)
+        self.assertEqual(self.adb.getprop("sys.boot_completed"), "0")
+        self.assertEqual(self.server.commands.count("getprop"), 2)
+        self.server.props["ro.product.model"] = "Other"
+        self.assertEqual(self.adb.getprop("ro.product.model"), "Fake")
+        self.assertEqual(self.server.commands.count("getprop"), 2)
+        self.adb.refresh_props()
+        self.assertEqual(self.adb.getprop("ro.product.model"), "Other")
+        self.assertEqual(self.adb.getprop("ro.product.model", strip=False).strip(), "Other")
+
+    def test_parse_props(self):
+        output = "[ro.build.version.sdk]: [25]\r\n[persist.sys.locale]: [en-US]\r\n[multi.line]: [a\nb]\n"
+        self.assertEqual(ADB._parse_props(output),
+                         {"ro.build.version.sdk": "25", "persist.sys.locale": "en-US", "multi.line": "a\nb"})
+        output = "[ro.build.version.sdk]: [23]\r\r\n[persist.sys.locale]: [en-US]\r\r\n"
+        self.assertEqual(ADB._parse_props(output), {"ro.build.version.sdk": "23", "persist.sys.locale": "en-US"})
+        # the key missing from the dump is read alone
+        self.server.outputs["getprop"] = "unexpected\n"
+        self.adb.refresh_props()
+        self.assertEqual(self.adb.sdk_version, 25)
+        self.assertIn("getprop ro.build.version.sdk", self.server.commands)
+
+    def test_line_breaker(self):
+        self.assertEqual(self.adb.line_breaker, b"\n")
+        # the pty of old devices writes \r\n, not translated by the host protocol client
+        self.server.props["ro.build.version.sdk"] = "23"
+        self.adb.refresh_props()
+        self.adb._line_breaker = None
+        self.assertEqual(self.adb.line_breaker, b"\r\n")
+
+    def test_shell_batch(self):
+        results = self.adb.shell_batch(["echo a", "fail", ["echo", "b", "c"]])
+        self.assertEqual(results, [("a\n", 0), ("", 1), ("b c\n", 0)])
+        # pty output converted again on Windows
+        self.server.line_ending = b"\r\r\n"
+        results = self.adb.shell_batch(["echo a", "fail"])
+        self.assertEqual(results, [("a\r\r\n", 0), ("", 1)])
+        self.server.line_ending = b"\n"
+        self.assertEqual(self.adb.get_screen_status(), {"screenon": True, "locked": False, "top_activity": None})
+
+    def test_display_probes(self):
+        self.server.outputs.update({
+            "dumpsys display": "  PhysicalDisplayInfo{1080 x 1920, 60.0 fps, density 3.0, 480.0 x 480.0 dpi}\n",
+            "dumpsys SurfaceFlinger": "  orientation=1, flags=0\n",
+            "getevent -p": ("    ABS (0003): 0035  : value 0, min 0, max 1079, fuzz 0, flat 0, resolution 0\n"
+                            "                0036  : value 0, min 0, max 1919, fuzz 0, flat 0, resolution 0\n"),
+        })
+        info = self.adb.get_display_info()
+        self.assertEqual(info, {"width": 1080, "height": 1920, "density": 3.0, "orientation": 1, "rotation": 90,
+                                "max_x": 1079, "max_y": 1919})
+        # fallbacks are run only when the primary probes fail
+        self.assertNotIn("dumpsys window", self.server.commands)
+        self.assertNotIn("dumpsys input", self.server.commands)
+        del self.server.outputs["dumpsys display"]
+        del self.server.outputs["dumpsys SurfaceFlinger"]
+        self.server.outputs.update({
+            "wm size": "Physical size: 720x1280\n",
+            "wm density": "Physical density: 320\n",
+            "dumpsys input": "    SurfaceOrientation: 3\n",
+        })
+        self.assertEqual(self.adb.getPhysicalDisplayInfo(), {"width": 720, "height": 1280, "density": 320.0})
+        self.assertIn("dumpsys window", self.server.commands)
+        self.assertEqual(self.adb.getDisplayOrientation(), 3)
+
+    def test_parse_top_activity(self):
+        activity_out = "TASK com.example id=1\n  ACTIVITY com.example/.MainActivity 3c1a2f pid=1234\n"
+        self.assertEqual(ADB._parse_top_activity(activity_out), ("com.example", ".MainActivity", "1234"))
+
+    def test_shell_sessions(self):
+        adb = ADB(SERIALNO, server_addr=("127.0.0.1", self.server.port), native=True, shell_sessions=1)
+        adb.shell_pool.timeout = 0.5
+        transports = self.server.transports
+        for i in range(5):
+            self.assertEqual(adb.shell(["echo", str(i)]), "%s\n" % i)
+        with self.assertRaises(AdbShellError) as cm:
+            adb.shell("fail")
+        self.assertEqual(cm.exception.stderr, "failed\n")
+        self.assertEqual(self.server.transports - transports, 1)
+        # the command may have been run when the session times out, it is not run again
+        with self.assertRaises(AdbShellError):
+            adb.shell("hang")
+        self.assertNotIn("hang", self.server.commands)
+        self.assertEqual(adb.shell("echo ok"), "ok\n")
+        # unclosed quotes are never written to the session, they are run by a one-shot shell
+        adb.shell("echo 'hello")
+        self.assertIn("echo 'hello", self.server.commands)
+
+
+@unittest.skipIf(sys.version_info < (3, 6), "AsyncADB requires Python 3.6+")
+class TestAsyncADB(unittest.TestCase):
+
+    def setUp(self):
+        from airtest.core.android.asyncadb import AsyncADB
+        self.server = FakeAdbServer()
+        self.adb = AsyncADB(SERIALNO, adb_path="adb", server_addr=("127.0.0.1", self.server.port))
+
+    def tearDown(self):
+        self.server.close()
+
+    def run_coro(self, coro):
+        import asyncio
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_shell(self):
+        self.assertEqual(self.run_coro(self.adb.devices()), [(SERIALNO, "device")])
+        self.assertEqual(self.run_coro(self.adb.shell("echo hello")), "hello\n")
+        with self.assertRaises(AdbShellError) as cm:
+            self.run_coro(self.adb.shell("fail"))
+        self.assertEqual(cm.exception.stderr, "failed\n")
+        with self.assertRaises(AdbError):
+            self.run_coro(type(self.adb)("unknown", server_addr=("127.0.0.1", self.server.port)).features())
+
+    def test_concurrent(self):
+        import asyncio
+
+        async def run():
+            return await asyncio.gather(*[self.adb.shell("echo %s" % i) for i in range(10)])
+
+        self.assertEqual(self.run_coro(run()), ["%s\n" % i for i in range(10)])
+
+    def test_forward(self):
+        self.run_coro(self.adb.forward("tcp:11111", "localabstract:minicap"))
+        self.assertEqual(self.run_coro(self.adb.get_forwards()), [(SERIALNO, "tcp:11111", "localabstract:minicap")])
+
+    def test_push_pull(self):
+        tmpdir = tempfile.mkdtemp()
+        local = os.path.join(tmpdir, "file.bin")
+        data = os.urandom(1000)
+        with open(local, "wb") as f:
+            f.write(data)
+        self.run_coro(self.adb.push(local, "/sdcard"))
+        self.assertEqual(self.server.files["/sdcard/file.bin"], data)
+        pulled = os.path.join(tmpdir, "pulled.bin")
+        self.run_coro(self.adb.pull("/sdcard/file.bin", pulled))
+        with open(pulled, "rb") as f:
+            self.assertEqual(f.read(), data)
+        with self.assertRaises(AdbError):
+            self.run_coro(self.adb.pull("/sdcard/not_exist", pulled))
+        self.assertFalse(os.path.exists(pulled))
+        with self.assertRaises(AdbError) as cm:
+            self.run_coro(self.adb.push(local, "/system/file.bin"))
+        self.assertEqual(cm.exception.stderr, "Read-only file system")
+
+
+if __name__ == '__main__':
+    unittest.main()
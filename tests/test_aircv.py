@@ -0,0 +1,205 @@
+# encoding=utf-8
+from airtest import aircv
+from airtest.aircv.template import find_template, find_all_template
+from airtest.aircv.cal_confidence import cal_rgb_confidence, cal_rgb_confidence_batch
+from airtest.aircv.keypoint import find_keypoint, find_all_keypoint
+from airtest.aircv.sift import find_sift, find_all_sift, mask_sift, FrameFeatures, _get_search_features, _get_source_features
+from airtest.aircv.frame import LazyFrame, get_encoded_size
+from testconf import IMG
+import numpy as np
+import os
+import tempfile
+import threading
+import unittest
+
+
+def make_screen(image, positions, resolution=(2560, 1536)):
+    """paste image on a noise background, positions are the left top points"""
+    w, h = resolution
+    screen = np.random.RandomState(0).randint(0, 255, (h, w, 3)).astype(np.uint8)
+    th, tw = image.shape[:2]
+    for x, y in positions:
+        screen[y:y + th, x:x + tw] = image
+    return screen
+
+
+class TestTemplate(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.search = aircv.imread(IMG)
+        cls.h, cls.w = cls.search.shape[:2]
+        cls.source = make_screen(cls.search, [(1203, 421)])
+
+    def test_find_template(self):
+        ret = find_template(self.source, self.search)
+        self.assertEqual(ret["rectangle"][0], (1203, 421))
+
+    def test_pyramid(self):
+        ret = find_template(self.source, self.search)
+        for levels in (1, 2, 3, 10):
+            ret_pyramid = find_template(self.source, self.search, pyramid_levels=levels)
+            self.assertEqual(sorted(ret_pyramid.keys()), sorted(ret.keys()))
+            self.assertEqual(ret_pyramid["result"], ret["result"])
+            self.assertEqual(ret_pyramid["rectangle"], ret["rectangle"])
+            self.assertAlmostEqual(ret_pyramid["confidence"], ret["confidence"], places=5)
+
+    def test_pyramid_not_found(self):
+        source = make_screen(self.search, [])
+        self.assertIsNone(find_template(source, self.search, pyramid_levels=2))
+
+    def test_find_all_template(self):
+        positions = [(100 + i * (self.w + 5), 200) for i in range(2)] + [(100, 250 + self.h)]
+        source = make_screen(self.search, positions)
+        for rgb in (False, True):
+            ret = find_all_template(source, self.search, rgb=rgb)
+            self.assertEqual(sorted(r["rectangle"][0] for r in ret), sorted(positions))
+            for r in ret:
+                self.assertGreater(r["confidence"], 0.99)
+        self.assertEqual(len(find_all_template(source, self.search, max_count=2)), 2)
+        self.assertIsNone(find_all_template(make_screen(self.search, []), self.search))
+
+    def test_rgb_confidence_batch(self):
+        crops = [self.source[421:421 + self.h, 1203 + dx:1203 + dx + self.w] for dx in (0, 3, 30)]
+        crops.append(np.full_like(self.search, 100))
+        confidences = cal_rgb_confidence_batch(crops, self.search)
+        for crop, confidence in zip(crops, confidences):
+            self.assertAlmostEqual(confidence, cal_rgb_confidence(crop, self.search), places=4)
+
+
+class TestSift(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.search = aircv.imread(IMG)
+        # scaled target on a plain background
+        cls.source = np.full((768, 1280, 3), 127, np.uint8)
+        target = aircv.cv2.resize(cls.search, None, fx=0.8, fy=0.8)
+        h, w = target.shape[:2]
+        cls.source[300:300 + h, 200:200 + w] = target
+        cls.center = (200 + w // 2, 300 + h // 2)
+
+    def test_find_sift(self):
+        ret = find_sift(self.source, self.search)
+        self.assertAlmostEqual(ret["result"][0], self.center[0], delta=5)
+        self.assertAlmostEqual(ret["result"][1], self.center[1], delta=5)
+
+    def test_find_keypoint(self):
+        ret = find_keypoint(self.source, self.search, method="orb")
+        self.assertAlmostEqual(ret["result"][0], self.center[0], delta=5)
+        self.assertAlmostEqual(ret["result"][1], self.center[1], delta=5)
+
+    def test_find_all_sift(self):
+        source = np.full((1000, 2000, 3), 127, np.uint8)
+        target = aircv.cv2.resize(self.search, None, fx=0.8, fy=0.8)
+        h, w = target.shape[:2]
+        positions = [(50, 50), (60 + w, 50), (50, 100 + h)]
+        for x, y in positions:
+            source[y:y + h, x:x + w] = target
+        centers = sorted((x + w // 2, y + h // 2) for x, y in positions)
+        for find_all in (find_all_sift, mask_sift, find_all_keypoint):
+            ret = sorted(r["result"] for r in find_all(source, self.search))
+            self.assertEqual(len(ret), len(centers))
+            for pos, center in zip(ret, centers):
+                self.assertAlmostEqual(pos[0], center[0], delta=5)
+                self.assertAlmostEqual(pos[1], center[1], delta=5)
+        self.assertEqual(len(find_all_sift(source, self.search, max_count=2)), 2)
+
+    def test_search_features_cached(self):
+        features = _get_search_features(self.search)
+        self.assertIs(_get_search_features(self.search.copy()), features)
+        self.assertIsNot(_get_search_features(self.search[1:]), features)
+
+    def test_frame_features(self):
+        source = self.source.copy()
+        features = _get_source_features(source)
+        self.assertIs(_get_source_features(source), features)
+        # a region of the frame is calculated once as well
+        region = _get_source_features(source[100:500, 100:900])
+        self.assertIs(_get_source_features(source[100:500, 100:900]), region)
+        self.assertIsNot(region, features)
+        self.assertEqual(len(FrameFeatures.of(source)._features), 2)
+        # another frame
+        self.assertIsNot(_get_source_features(source.copy()), features)
+
+    def test_frame_features_concurrent(self):
+        source = self.source.copy()
+        results = []
+
+        def get(rect):
+            region = source if rect is None else source[rect[1]:rect[3], rect[0]:rect[2]]
+            results.append((rect, FrameFeatures.of(source), _get_source_features(region)))
+
+        rects = [None, (100, 100, 900, 500)] * 4
+        threads = [threading.Thread(target=get, args=(rect,)) for rect in rects]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # one FrameFeatures for the frame, and the features of each region are calculated once
+        self.assertEqual(len(set(id(r[1]) for r in results)), 1)
+        self.assertEqual(len(set((r[0], id(r[2])) for r in results)), 2)
+
+
+class TestLazyFrame(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.screen = make_screen(aircv.imread(IMG)[:100, :200], [(100, 200)], resolution=(640, 360))
+        cls.png = aircv.cv2.imencode(".png", cls.screen)[1].tobytes()
+        cls.jpg = aircv.cv2.imencode(".jpg", cls.screen)[1].tobytes()
+
+    def test_encoded_size(self):
+        self.assertEqual(get_encoded_size(self.png), (640, 360))
+        self.assertEqual(get_encoded_size(self.jpg), (640, 360))
+        self.assertIsNone(get_encoded_size(b"not an image" * 4))
+
+    def test_decode(self):
+        frame = LazyFrame(self.png)
+        self.assertEqual(frame.resolution, (640, 360))
+        self.assertFalse(frame._images)
+        gray = aircv.cv2.cvtColor(self.screen, aircv.cv2.COLOR_BGR2GRAY)
+        self.assertLessEqual(np.abs(frame.gray().astype(int) - gray).max(), 1)
+        self.assertTrue(np.array_equal(frame.color(), self.screen))
+        self.assertIs(frame.color(), frame.color())
+        self.assertEqual(frame.gray(4).shape, (90, 160))
+        self.assertEqual(LazyFrame(self.jpg).color(2).shape, (180, 320, 3))
+        self.assertEqual(LazyFrame(self.jpg).thumbnail(160).shape, (90, 160))
+        # png is decoded only once, the thumbnail is scaled down from the full gray image
+        frame = LazyFrame(self.png)
+        self.assertEqual(frame.thumbnail(160).shape, (90, 160))
+        self.assertEqual(sorted(frame._images), [(True, 1), (True, 4)])
+        self.assertIsNone(LazyFrame(b"broken").color())
+
+    def test_rotation(self):
+        frame = LazyFrame(self.jpg, rotation=90)
+        self.assertEqual(frame.resolution, (360, 640))
+        self.assertEqual(frame.gray().shape, (640, 360))
+        frame = LazyFrame(image=self.screen, rotation=270)
+        self.assertIsNone(frame.jpeg())
+        self.assertEqual(frame.resolution, (360, 640))
+        self.assertEqual(frame.gray(2).shape, (320, 180))
+
+    def test_jpeg(self):
+        self.assertEqual(LazyFrame(self.jpg).jpeg(), self.jpg)
+        self.assertIsNone(LazyFrame(self.png).jpeg())
+        self.assertIsNone(LazyFrame(self.jpg, rotation=90).jpeg())
+
+    def test_save(self):
+        filename = os.path.join(tempfile.mkdtemp(), "screen.jpg")
+        LazyFrame(self.jpg).save(filename)
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(), self.jpg)
+        LazyFrame(self.png).save(filename)
+        self.assertEqual(aircv.imread(filename).shape, self.screen.shape)
+        # rotated frame is encoded again, as the orientation tags are ignored by aircv.imread
+        for rotation in (90, 180, 270):
+            frame = LazyFrame(self.jpg, rotation=rotation)
+            frame.save(filename)
+            image = aircv.imread(filename)
+            self.assertEqual(image.shape, frame.color().shape)
+            self.assertLess(np.mean(aircv.cv2.absdiff(image, frame.color())), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
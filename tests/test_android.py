@@ -1,9 +1,11 @@
 # encoding=utf-8
 import os
 import time
+import struct
 import numpy
 import unittest
 from airtest.core.android.android import Android, ADB, Minicap, Minitouch, IME_METHOD, CAP_METHOD, TOUCH_METHOD
+from airtest.core.android.android import raw_screencap_2_img
 from airtest.core.error import AirtestError
 from testconf import APK, PKG, try_remove
 
@@ -67,7 +69,8 @@ class TestAndroid(unittest.TestCase):
     def test_snapshot(self):
         self._install_test_app()
 
-        for i in (CAP_METHOD.ADBCAP, CAP_METHOD.MINICAP, CAP_METHOD.MINICAP_STREAM, CAP_METHOD.JAVACAP):
+        for i in (CAP_METHOD.ADBCAP, CAP_METHOD.ADBCAP_RAW, CAP_METHOD.MINICAP, CAP_METHOD.MINICAP_STREAM,
+                  CAP_METHOD.JAVACAP):
             filename = "./screen.png"
             if os.path.exists(filename):
                 os.remove(filename)
@@ -78,6 +81,26 @@ class TestAndroid(unittest.TestCase):
             self.assertTrue(os.path.exists(filename))
             os.remove(filename)
 
+    def test_cap_scale(self):
+        for i in (CAP_METHOD.MINICAP_STREAM, CAP_METHOD.JAVACAP):
+            android = Android(cap_method=i, cap_scale=0.5)
+            w, h = android.get_current_resolution()
+            full_w, full_h = self.android.get_current_resolution()
+            self.assertAlmostEqual(w, full_w * 0.5, delta=1)
+            screen = android.snapshot()
+            self.assertAlmostEqual(screen.shape[1], w, delta=1)
+            self.assertAlmostEqual(screen.shape[0], h, delta=1)
+            self.assertEqual(android._scale_to_display((w / 2, h / 2)), (w, h))
+            android.touch((w / 2, h / 2))
+            android.pinch(center=(w / 2, h / 2))
+
+    def test_raw_snapshot(self):
+        self.android.cap_method = CAP_METHOD.ADBCAP
+        screen = self.android.snapshot()
+        self.android.cap_method = CAP_METHOD.ADBCAP_RAW
+        screen_raw = self.android.snapshot()
+        self.assertEqual(screen.shape, screen_raw.shape)
+
     def test_shell(self):
         self.assertEqual(self.android.shell('echo nimei').strip(), 'nimei')
 
@@ -170,5 +193,22 @@ class TestAndroid(unittest.TestCase):
         self.android.pinch(in_or_out='out')
 
 
+class TestRawScreencap(unittest.TestCase):
+
+    def test_decode(self):
+        pixels = numpy.random.randint(0, 255, (3, 4, 4)).astype(numpy.uint8)
+        # header without and with the color space field
+        for header in (struct.pack("<3I", 4, 3, 1), struct.pack("<4I", 4, 3, 1, 1)):
+            screen = raw_screencap_2_img(header + pixels.tobytes())
+            self.assertEqual(screen.shape, (3, 4, 3))
+            self.assertTrue((screen == pixels[:, :, 2::-1]).all())
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            raw_screencap_2_img(struct.pack("<3I", 4, 3, 99) + b"\0" * 48)
+        with self.assertRaises(ValueError):
+            raw_screencap_2_img(struct.pack("<3I", 4, 3, 1) + b"\0" * 47)
+
+
 if __name__ == '__main__':
     unittest.main()
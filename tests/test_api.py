@@ -126,6 +126,21 @@ class TestMainOnAndroid(unittest.TestCase):
         self.assertIsInstance(pos, (tuple, list))
         self.assertFalse(exists(TPL2))
 
+    def test_wait_any(self):
+        self._start_apk_main_scene()
+        v, pos = wait_any([TPL2, TPL])
+        self.assertIs(v, TPL)
+        self.assertIsInstance(pos, (tuple, list))
+
+        with self.assertRaises(TargetNotFoundError):
+            wait_any([TPL2], timeout=5)
+
+    def test_exists_any(self):
+        self._start_apk_main_scene()
+        v, pos = exists_any([TPL2, TPL])
+        self.assertIs(v, TPL)
+        self.assertFalse(exists_any([TPL2]))
+
     def test_assert_exists(self):
         self._start_apk_main_scene()
         assert_exists(TPL)
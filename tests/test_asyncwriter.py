@@ -0,0 +1,90 @@
+# encoding=utf-8
+from airtest.utils.asyncwriter import AsyncWriter
+from airtest.utils.logwraper import AirtestLogger
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+
+class TestAsyncWriter(unittest.TestCase):
+
+    def test_order(self):
+        writer = AsyncWriter(maxsize=4)
+        result = []
+        for i in range(100):
+            writer.submit(result.append, i)
+        writer.flush()
+        self.assertEqual(result, list(range(100)))
+        writer.close()
+
+    def test_backpressure(self):
+        writer = AsyncWriter(maxsize=2)
+        blocker = threading.Event()
+        writer.submit(blocker.wait)
+        writer.submit(lambda: None)
+        writer.submit(lambda: None)
+        submitted = threading.Event()
+        t = threading.Thread(target=lambda: (writer.submit(lambda: None), submitted.set()))
+        t.start()
+        # queue is full
+        self.assertFalse(submitted.wait(0.2))
+        blocker.set()
+        self.assertTrue(submitted.wait(5))
+        writer.close()
+
+    def test_error(self):
+        writer = AsyncWriter()
+        result = []
+        writer.submit(lambda: 1 / 0)
+        writer.submit(result.append, 1)
+        writer.flush()
+        self.assertEqual(result, [1])
+        writer.close()
+
+    def test_close(self):
+        writer = AsyncWriter()
+        result = []
+        writer.submit(result.append, 1)
+        writer.close()
+        self.assertEqual(result, [1])
+        # synchronous after closed
+        writer.submit(result.append, 2)
+        self.assertEqual(result, [1, 2])
+
+
+class TestAsyncLogger(unittest.TestCase):
+
+    def test_log(self):
+        logfile = os.path.join(tempfile.mkdtemp(), "log.txt")
+        logger = AirtestLogger(logfile)
+        logger.set_writer(AsyncWriter())
+        data = {"name": "step"}
+        for i in range(10):
+            data["index"] = i
+            logger.log("info", data)
+        logger.set_writer(None)
+        with open(logfile) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line["data"]["index"] for line in lines], list(range(10)))
+
+    def test_flush(self):
+        logfile = os.path.join(tempfile.mkdtemp(), "log.txt")
+        logger = AirtestLogger(logfile)
+        writer = AsyncWriter()
+        logger.set_writer(writer)
+        blocker = threading.Event()
+        writer.submit(blocker.wait)
+        for i in range(10):
+            logger.log("info", {"index": i})
+        threading.Timer(0.2, blocker.set).start()
+        # the lines are all written when flushed, without closing the writer
+        logger.flush()
+        with open(logfile) as f:
+            self.assertEqual(len(f.readlines()), 10)
+        logger.set_writer(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
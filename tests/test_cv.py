@@ -0,0 +1,364 @@
+# encoding=utf-8
+from airtest import aircv
+from airtest.core.cv import (Template, Predictor, TEMPLATE_CACHE, FrameChangeDetector, FramePacer, match_many,
+                             try_log_screen, _snapshot)
+from airtest.core.helper import G
+from airtest.core.settings import Settings as ST
+from airtest.utils.asyncwriter import AsyncWriter
+from testconf import TPL, TPL2
+import numpy as np
+import os
+import tempfile
+import time
+import unittest
+
+
+def make_screen(templates, resolution=(2560, 1536)):
+    """paste templates on a noise background at their record_pos"""
+    w, h = resolution
+    screen = np.random.RandomState(0).randint(0, 255, (h, w, 3)).astype(np.uint8)
+    for tpl in templates:
+        image = aircv.imread(tpl.filepath)
+        th, tw = image.shape[:2]
+        x, y = Predictor.get_predict_point(tpl.record_pos, resolution)
+        x, y = int(x - tw / 2), int(y - th / 2)
+        screen[y:y + th, x:x + tw] = image
+    return screen
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.screen = make_screen([TPL, TPL2])
+
+    def setUp(self):
+        TEMPLATE_CACHE.clear()
+
+    def test_cache_hit(self):
+        image, image_gray = TPL._get_images(self.screen)
+        self.assertEqual(image_gray.ndim, 2)
+        self.assertGreater(len(TEMPLATE_CACHE), 0)
+        image2, image_gray2 = TPL._get_images(self.screen)
+        self.assertIs(image, image2)
+        self.assertIs(image_gray, image_gray2)
+
+    def test_resized(self):
+        half = self.screen[::2, ::2]
+        image, _ = TPL._get_images(self.screen)
+        image_half, _ = TPL._get_images(half)
+        self.assertLess(image_half.shape[0], image.shape[0])
+        self.assertEqual(len(TEMPLATE_CACHE), 2)
+
+    def test_disabled(self):
+        old = ST.TEMPLATE_CACHE_SIZE
+        ST.TEMPLATE_CACHE_SIZE = 0
+        try:
+            TPL._get_images(self.screen)
+            self.assertEqual(len(TEMPLATE_CACHE), 0)
+        finally:
+            ST.TEMPLATE_CACHE_SIZE = old
+
+    def test_match_in(self):
+        pos = TPL.match_in(self.screen)
+        x, y = Predictor.get_predict_point(TPL.record_pos, (2560, 1536))
+        self.assertAlmostEqual(pos[0], x, delta=2)
+        self.assertAlmostEqual(pos[1], y, delta=2)
+
+    def test_predict_area(self):
+        image, image_gray = TPL._get_images(self.screen)
+        ret = TPL._find_template_in_predict_area(image_gray, self.screen)
+        self.assertEqual(ret["result"], TPL._find_template(image_gray, self.screen)["result"])
+        # target far away from the record_pos, fall back to full screen search
+        moved = Template(TPL.filename, record_pos=(-0.2, 0.2), resolution=TPL.resolution)
+        self.assertIsNone(moved._find_template_in_predict_area(image_gray, self.screen))
+        self.assertEqual(moved.match_in(self.screen), TPL.match_in(self.screen))
+
+    def test_cvstrategy(self):
+        tpl = Template(TPL.filename, record_pos=TPL.record_pos, resolution=TPL.resolution, cvstrategy=["orb"])
+        pos = tpl.match_in(self.screen)
+        x, y = Predictor.get_predict_point(TPL.record_pos, (2560, 1536))
+        self.assertAlmostEqual(pos[0], x, delta=5)
+        self.assertAlmostEqual(pos[1], y, delta=5)
+
+    def test_match_all_in(self):
+        # screen resolution differs from the record resolution
+        screen = aircv.cv2.resize(make_screen([TPL]), None, fx=0.75, fy=0.75)
+        tpl = Template(TPL.filename, resolution=(2560, 1536), cvstrategy=["sift"])
+        ret = tpl.match_all_in(screen)
+        self.assertEqual(len(ret), 1)
+        self.assertAlmostEqual(ret[0]["result"][0], tpl.match_in(screen)[0], delta=5)
+
+    def test_file_not_exist(self):
+        with self.assertRaises(aircv.FileNotExistError):
+            Template("not_exist.png")._get_images(self.screen)
+
+
+class TestConcurrentStrategy(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.screen = make_screen([TPL])
+
+    def setUp(self):
+        ST.CVSTRATEGY_CONCURRENT = True
+
+    def tearDown(self):
+        ST.CVSTRATEGY_CONCURRENT = False
+
+    def _match(self, strategies, threshold=None):
+        tpl = Template(TPL.filename, threshold=threshold, record_pos=TPL.record_pos, resolution=TPL.resolution,
+                       cvstrategy=strategies)
+        return tpl._cv_match(self.screen)
+
+    def test_priority(self):
+        for strategies in (["tpl", "orb"], ["orb", "tpl"]):
+            ret = self._match(strategies)
+            ST.CVSTRATEGY_CONCURRENT = False
+            self.assertEqual(ret, self._match(strategies[:1]))
+            ST.CVSTRATEGY_CONCURRENT = True
+
+    def test_not_found(self):
+        self.assertIsNone(self._match(["tpl", "orb", "unknown"], threshold=1.01))
+
+    def test_error(self):
+        with self.assertRaises(ZeroDivisionError):
+            tpl = Template(TPL.filename, cvstrategy=["tpl", "orb"])
+            tpl._match_with_method = lambda *args: 1 / 0
+            tpl._cv_match(self.screen)
+
+
+class TestFrameChangeDetector(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = ST.FRAME_DIFF_THRESHOLD, ST.DIRTY_REGION_RATIO
+        ST.FRAME_DIFF_THRESHOLD, ST.DIRTY_REGION_RATIO = 0, 0.5
+
+    def tearDown(self):
+        ST.FRAME_DIFF_THRESHOLD, ST.DIRTY_REGION_RATIO = self.settings
+
+    def test_changed(self):
+        screen = make_screen([])
+        detector = FrameChangeDetector()
+        self.assertTrue(detector.changed(screen))
+        self.assertFalse(detector.changed(screen.copy()))
+        # a small icon shows up
+        screen2 = screen.copy()
+        screen2[100:140, 100:140] = 255
+        self.assertTrue(detector.changed(screen2))
+        self.assertFalse(detector.changed(screen2))
+        # rotated
+        self.assertTrue(detector.changed(screen2.transpose(1, 0, 2)))
+        self.assertIsNone(detector.dirty_rects)
+
+    def test_dirty_rects(self):
+        screen = make_screen([])
+        detector = FrameChangeDetector()
+        detector.changed(screen)
+        self.assertIsNone(detector.dirty_rects)
+        screen2 = screen.copy()
+        screen2[100:140, 100:140] = 255
+        screen2[1000:1010, 2000:2300] = 0
+        self.assertTrue(detector.changed(screen2))
+        self.assertEqual(len(detector.dirty_rects), 2)
+        for x_min, y_min, x_max, y_max in [(100, 100, 140, 140), (2000, 1000, 2300, 1010)]:
+            self.assertTrue(any(r[0] <= x_min and r[1] <= y_min and r[2] >= x_max and r[3] >= y_max
+                                for r in detector.dirty_rects))
+        self.assertLess(sum((r[2] - r[0]) * (r[3] - r[1]) for r in detector.dirty_rects), 2560 * 1536 * 0.05)
+
+    def test_match_dirty_regions(self):
+        tpl = Template(TPL.filename, cvstrategy=["tpl"])
+        screen = make_screen([TPL])
+        pos = tpl.match_in(screen)
+        # target is partly covered by the change
+        dirty_rects = [(int(pos[0]), int(pos[1]), int(pos[0]) + 10, int(pos[1]) + 10)]
+        self.assertEqual(tpl.match_in(screen, dirty_rects=dirty_rects), pos)
+        # target is outside the changed regions
+        self.assertIsNone(tpl.match_in(screen, dirty_rects=[(0, 0, 10, 10)]))
+        # changes are too large, match the whole screen
+        self.assertEqual(tpl.match_in(screen, dirty_rects=[(0, 0, 2560, 1536)]), pos)
+
+    def test_lazy_frame(self):
+        screen = make_screen([])
+        encode = lambda img: aircv.LazyFrame(aircv.cv2.imencode(".jpg", img)[1].tobytes())
+        detector = FrameChangeDetector()
+        self.assertTrue(detector.changed(encode(screen)))
+        self.assertFalse(detector.changed(encode(screen)))
+        screen2 = screen.copy()
+        screen2[100:140, 100:140] = 255
+        frame = encode(screen2)
+        self.assertTrue(detector.changed(frame))
+        self.assertEqual(len(detector.dirty_rects), 1)
+        # only the thumbnail is decoded
+        self.assertEqual(list(frame._images), [(True, 8)])
+
+    def test_disabled(self):
+        ST.FRAME_DIFF_THRESHOLD = None
+        screen = make_screen([])
+        detector = FrameChangeDetector()
+        self.assertTrue(detector.changed(screen))
+        self.assertTrue(detector.changed(screen))
+
+    def test_dirty_regions_disabled(self):
+        ST.DIRTY_REGION_RATIO = 0
+        screen = make_screen([])
+        detector = FrameChangeDetector()
+        detector.changed(screen)
+        screen2 = screen.copy()
+        screen2[100:140, 100:140] = 255
+        self.assertTrue(detector.changed(screen2))
+        self.assertIsNone(detector.dirty_rects)
+        tpl = Template(TPL.filename, cvstrategy=["tpl"])
+        screen = make_screen([TPL])
+        self.assertEqual(tpl.match_in(screen, dirty_rects=[(0, 0, 10, 10)]), tpl.match_in(screen))
+
+
+class StreamDevice(object):
+
+    def __init__(self):
+        self.waited = 0
+
+    def wait_new_frame(self, timeout=None):
+        self.waited += 1
+        return True
+
+
+class TestFramePacer(unittest.TestCase):
+
+    def setUp(self):
+        self.device, G.DEVICE = G.DEVICE, StreamDevice()
+
+    def tearDown(self):
+        G.DEVICE = self.device
+        ST.FIND_FRAME_DRIVEN = False
+
+    def _wait(self, match_cost=0):
+        pacer = FramePacer(interval=0.5)
+        pacer.start()
+        with pacer.matching():
+            time.sleep(match_cost)
+        start = time.time()
+        pacer.wait()
+        return time.time() - start
+
+    def test_interval(self):
+        self.assertGreaterEqual(self._wait(), 0.5)
+        self.assertEqual(G.DEVICE.waited, 0)
+
+    def test_frame_driven(self):
+        ST.FIND_FRAME_DRIVEN = True
+        self.assertLess(self._wait(), 0.2)
+        self.assertEqual(G.DEVICE.waited, 1)
+        # cpu budget
+        self.assertGreaterEqual(self._wait(match_cost=0.1), 0.1 * (1 / ST.FIND_CPU_BUDGET - 1) - 0.01)
+
+
+class TestMatchMany(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cvstrategy, ST.CVSTRATEGY = ST.CVSTRATEGY, ['tpl']
+        cls.screen = make_screen([TPL2])
+
+    @classmethod
+    def tearDownClass(cls):
+        ST.CVSTRATEGY = cls.cvstrategy
+
+    def test_match_many(self):
+        result = match_many([TPL, TPL2], self.screen)
+        self.assertEqual(len(result), 1)
+        query, pos, confidence = result[0]
+        self.assertIs(query, TPL2)
+        self.assertEqual(pos, TPL2.match_in(self.screen))
+        self.assertGreaterEqual(confidence, TPL2.threshold)
+
+    def test_first_only(self):
+        screen = make_screen([TPL, TPL2])
+        result = match_many([TPL2, TPL], screen, first_only=True)
+        self.assertEqual(len(result), 1)
+        self.assertIs(result[0][0], TPL2)
+        self.assertEqual(len(match_many([TPL2, TPL], screen)), 2)
+
+    def test_lazy_frame(self):
+        frame = aircv.LazyFrame(aircv.cv2.imencode(".png", self.screen)[1].tobytes())
+        result = match_many([TPL, TPL2], frame)
+        self.assertEqual([r[:2] for r in result], [r[:2] for r in match_many([TPL, TPL2], self.screen)])
+        self.assertEqual(match_many([TPL, TPL2], aircv.LazyFrame(b"\x89PNG\r\n\x1a\n" + b"\x00" * 24)), [])
+
+    def test_find_many(self):
+        from airtest.core.api import find_many
+        device, G.DEVICE = G.DEVICE, ScreenDevice(self.screen)
+        try:
+            self.assertEqual([r[:2] for r in find_many([TPL, TPL2])], [r[:2] for r in match_many([TPL2], self.screen)])
+            G.DEVICE.screen = None
+            self.assertEqual(find_many([TPL, TPL2]), [])
+        finally:
+            G.DEVICE = device
+
+    def test_snapshot(self):
+        data = aircv.cv2.imencode(".png", self.screen)[1].tobytes()
+        device, G.DEVICE = G.DEVICE, FrameDevice(data)
+        threshold = ST.FRAME_DIFF_THRESHOLD
+        try:
+            ST.FRAME_DIFF_THRESHOLD = None
+            frame = _snapshot()
+            # nothing is decoded until matching
+            self.assertFalse(frame._images)
+            ST.FRAME_DIFF_THRESHOLD = 0
+            frame = _snapshot()
+            self.assertEqual(sorted(frame._images), [(True, 1), (True, 8)])
+            G.DEVICE.data = b"broken" * 10
+            self.assertIsNone(_snapshot())
+        finally:
+            G.DEVICE = device
+            ST.FRAME_DIFF_THRESHOLD = threshold
+
+
+class ScreenDevice(object):
+
+    def __init__(self, screen):
+        self.screen = screen
+
+    def snapshot(self, filename=None):
+        return self.screen
+
+
+class FrameDevice(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    def snapshot_frame(self):
+        return aircv.LazyFrame(self.data)
+
+
+class TestLogScreen(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir, ST.LOG_DIR = ST.LOG_DIR, tempfile.mkdtemp()
+
+    def tearDown(self):
+        ST.LOG_DIR = self.log_dir
+
+    def test_lazy_frame(self):
+        screen = make_screen([], resolution=(640, 360))
+        data = aircv.cv2.imencode(".jpg", screen)[1].tobytes()
+        filename = try_log_screen(aircv.LazyFrame(data))
+        with open(os.path.join(ST.LOG_DIR, filename), "rb") as f:
+            self.assertEqual(f.read(), data)
+        filename = try_log_screen(screen)
+        self.assertEqual(aircv.imread(os.path.join(ST.LOG_DIR, filename)).shape, screen.shape)
+
+    def test_async(self):
+        screen = make_screen([], resolution=(640, 360))
+        G.LOGGER.set_writer(AsyncWriter())
+        try:
+            filename = try_log_screen(screen)
+            G.LOGGER.writer.flush()
+            self.assertEqual(aircv.imread(os.path.join(ST.LOG_DIR, filename)).shape, screen.shape)
+        finally:
+            G.LOGGER.set_writer(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -58,6 +58,47 @@ class TestMinicap(TestMinicapBase):
         self.assertEqual(frame_vertical.shape[1], frame_horizontal.shape[0])
         self.assertEqual(self._count_server_proc(), 1)
 
+    def test_scale(self):
+        minicap = Minicap(self.dev.adb, ori_function=self.dev.get_display_info, scale=0.5)
+        frame = string_2_img(minicap.get_frame())
+        full = string_2_img(self.minicap.get_frame())
+        self.assertAlmostEqual(frame.shape[0], full.shape[0] * 0.5, delta=1)
+        self.assertAlmostEqual(frame.shape[1], full.shape[1] * 0.5, delta=1)
+
+
+class TestMinicapBackground(TestMinicapBase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestMinicapBackground, cls).setUpClass()
+        cls.minicap = Minicap(cls.dev.adb, ori_function=cls.dev.get_display_info, background=True)
+
+    def test_get_frames(self):
+        frame = self.minicap.get_frame_from_stream()
+        self.assertIsInstance(string_2_img(frame), ndarray)
+        # the latest frame is returned at once
+        start = time.time()
+        self.minicap.get_frame_from_stream()
+        self.assertLess(time.time() - start, 0.1)
+
+    def test_wait_for_frame(self):
+        seq, timestamp, frame = self.minicap.wait_for_frame(timeout=10)
+        self.assertIsInstance(string_2_img(frame), ndarray)
+        self.assertLessEqual(timestamp, time.time())
+        self.dev.keyevent("HOME")
+        newer = self.minicap.wait_for_frame(newer_than=seq, timeout=10)
+        self.assertGreater(newer[0], seq)
+
+    def test_teardown(self):
+        self.minicap.wait_for_frame(timeout=10)
+        grabber = self.minicap._grabber
+        # the grabber is blocked in recv on a static screen, teardown wakes it up and waits for it
+        time.sleep(2)
+        self.minicap.teardown_stream()
+        self.assertFalse(grabber.is_alive())
+        self.assertIsNone(self.minicap._frame)
+        self.assertEqual(self._count_server_proc(), 0)
+
 
 class TestMinicapSetup(TestMinicapBase):
 
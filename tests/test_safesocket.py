@@ -0,0 +1,54 @@
+# encoding=utf-8
+from airtest.utils.safesocket import SafeSocket
+import numpy as np
+import socket
+import threading
+import unittest
+
+
+class TestSafeSocket(unittest.TestCase):
+
+    def setUp(self):
+        sock1, sock2 = socket.socketpair()
+        self.client, self.server = SafeSocket(sock1), SafeSocket(sock2)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def _send_async(self, data):
+        t = threading.Thread(target=self.server.send, args=(data,))
+        t.start()
+        return t
+
+    def test_recv(self):
+        data = np.random.randint(0, 255, 500 * 1024).astype(np.uint8).tobytes()
+        t = self._send_async(b"\x01\x02" + data)
+        self.assertEqual(self.client.recv(2), b"\x01\x02")
+        self.assertEqual(self.client.recv(len(data)), data)
+        t.join()
+
+    def test_recv_view(self):
+        t = self._send_async(b"abcdefgh")
+        view = self.client.recv_view(5)
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(view.tobytes(), b"abcde")
+        self.assertEqual(np.frombuffer(view, np.uint8).tolist(), list(bytearray(b"abcde")))
+        self.assertEqual(self.client.recv_view(3).tobytes(), b"fgh")
+        t.join()
+
+    def test_recv_with_timeout(self):
+        self.server.send(b"abc")
+        self.assertIsNone(self.client.recv_with_timeout(5, timeout=0.1))
+        # the received part is kept for the next recv
+        self.server.send(b"de")
+        self.assertEqual(self.client.recv(5), b"abcde")
+
+    def test_broken(self):
+        self.server.close()
+        with self.assertRaises(socket.error):
+            self.client.recv(1)
+
+
+if __name__ == '__main__':
+    unittest.main()